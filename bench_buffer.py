@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-frame CPU cost of turning a PIL image into SPI planes
+
+Compares the original getbuffer()/display() path (Python loops inverting
+every byte twice and a list red plane) with the current one (tobytes()
+handed to SPI through a memoryview, preallocated blank red plane). The
+driver runs on the epdconfig mock backend, so this measures host CPU time,
+not the bus or the panel.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from waveshare_epd import epdconfig
+from waveshare_epd.epd7in5b_V2 import BLANK_PLANE, EPD_HEIGHT, EPD_WIDTH, EPD
+
+
+def legacy_frame(epd, image):
+    """Original EPD.getbuffer() + display() with a list red plane"""
+    buf = bytearray(image.convert("1").tobytes("raw"))
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    red = [0x00] * (int(EPD_WIDTH / 8) * EPD_HEIGHT)
+
+    epd.send_command(0x10)
+    for i in range(len(buf)):
+        buf[i] ^= 0xFF
+    epd.send_data2(buf)
+    epd.send_command(0x13)
+    epd.send_data2(red)
+    epd.send_command(0x12)
+    epd.ReadBusy()
+
+
+def getbuffer_frame(epd, image):
+    """Current EPD.getbuffer() + display(): one translate each way"""
+    epd.display(epd.getbuffer(image), BLANK_PLANE)
+
+
+def direct_frame(epd, image):
+    """Current EPD.display_image(): image bytes straight to SPI"""
+    epd.display_image(image)
+
+
+def make_image():
+    image = Image.new("1", (EPD_WIDTH, EPD_HEIGHT), 255)
+    draw = ImageDraw.Draw(image)
+    for x in range(0, EPD_WIDTH, 40):
+        draw.rectangle([x, 0, x + 19, EPD_HEIGHT], fill=0)
+    draw.text((20, 20), "benchmark", fill=255)
+    return image
+
+
+def bench(func, epd, image, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        func(epd, image)
+    return (time.perf_counter() - start) / frames * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EPD buffer preparation")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per variant")
+    args = parser.parse_args()
+
+    epdconfig.use("mock")
+    epd = EPD(busy_settle_ms=0)
+    image = make_image()
+    results = [
+        ("legacy loops", bench(legacy_frame, epd, image, args.frames)),
+        ("getbuffer+display", bench(getbuffer_frame, epd, image, args.frames)),
+        ("display_image", bench(direct_frame, epd, image, args.frames)),
+    ]
+    baseline = results[0][1]
+    for name, ms in results:
+        print(f"{name:<20} {ms:8.3f} ms/frame  {baseline / ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the dither modes for speed and for frame-to-frame churn
+
+Each mode converts a sequence of greyscale 800x480 frames in which a grey
+disc moves over a gradient a few pixels at a time, the way an animated
+dashboard widget does. Throughput is host CPU time per frame. Churn is how
+many 1-bit pixels differ between consecutive frames compared with the
+pixels whose grey level actually changed, plus the area of the bounding box
+around them: that is what the next partial refresh has to cover.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+import dither
+
+EPD_WIDTH = 800
+EPD_HEIGHT = 480
+
+
+def make_frames(count, step):
+    """Gradient background with a grey disc moving step pixels per frame"""
+    x = np.linspace(0, 255, EPD_WIDTH, dtype=np.float32)
+    y = np.linspace(0, 64, EPD_HEIGHT, dtype=np.float32)
+    background = Image.fromarray(
+        np.clip(x[None, :] * 0.75 + y[:, None], 0, 255).astype(np.uint8), "L"
+    )
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        cx = 200 + i * step
+        ImageDraw.Draw(frame).ellipse([cx - 60, 180, cx + 60, 300], fill=96)
+        frames.append(frame)
+    return frames
+
+
+def changed(a, b):
+    """Number of differing pixels and the area of their bounding box"""
+    diff = np.asarray(a) != np.asarray(b)
+    rows = np.flatnonzero(diff.any(axis=1))
+    columns = np.flatnonzero(diff.any(axis=0))
+    if not len(rows):
+        return 0, 0
+    area = (rows[-1] - rows[0] + 1) * (columns[-1] - columns[0] + 1)
+    return int(diff.sum()), int(area)
+
+
+def bench(mode, frames):
+    dither.dither(frames[0], mode)  # Builds any cached threshold map
+    start = time.perf_counter()
+    outputs = [dither.dither(frame, mode) for frame in frames]
+    ms = (time.perf_counter() - start) / len(frames) * 1000.0
+
+    pixels = areas = 0
+    for previous, current in zip(outputs, outputs[1:]):
+        count, area = changed(previous, current)
+        pixels += count
+        areas += area
+    transitions = len(frames) - 1
+    return ms, pixels / transitions, areas / transitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EPD dither modes")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per mode")
+    parser.add_argument(
+        "--step", type=int, default=2, help="Pixels the disc moves per frame"
+    )
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.step)
+    source = [changed(a, b) for a, b in zip(frames, frames[1:])]
+    source_pixels = sum(count for count, _ in source) / len(source)
+    screen = EPD_WIDTH * EPD_HEIGHT
+
+    print(f"grey pixels changed per frame: {source_pixels:.0f}")
+    print(f"{'mode':<16} {'ms/frame':>9} {'Mpx/s':>7} {'flipped':>9} {'dirty box':>10}")
+    for mode in dither.MODES:
+        ms, pixels, area = bench(mode, frames)
+        print(
+            f"{mode:<16} {ms:9.3f} {screen / ms / 1000.0:7.1f} "
+            f"{pixels:9.0f} {area / screen:9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
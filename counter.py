@@ -3,25 +3,42 @@
 
 import sys
 import os
-import time
+import asyncio
 import logging
-from PIL import Image, ImageDraw, ImageFont
+from typing import List, NamedTuple, Optional, Tuple
 
 # Add the lib directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
 
 from waveshare_epd import epd7in5b_V2
+from framebuffer import FrameBuffer
+from geometry import Rect, align_rect, bounding_box, clip_rect
+from text_renderer import TextRenderer, changed_glyphs, load_font
+from tick_scheduler import TickScheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class CounterFrame(NamedTuple):
+    """A rendered counter value, ready to send to the panel"""
+
+    value: int
+    # glyph_boxes() of the text, for diffing the next frame against
+    glyphs: List[Tuple[str, Rect]]
+    # Byte-aligned window for a partial refresh, None for a full display;
+    # empty when nothing changed
+    window: Optional[Rect]
+    data: bytes
+
+
 class CounterDisplay:
     def __init__(self):
         """Initialize the e-paper display and counter"""
         self.epd = epd7in5b_V2.EPD()
         self.counter = 0
+        self.tick_seconds = 1.0
         self.font_size = 60
         self.text_color = 0  # Black
         self.bg_color = 255  # White
@@ -42,157 +59,124 @@ class CounterDisplay:
         self.epd.Clear()
         logger.info("Display initialized successfully")
 
-        # Font setup
-        try:
-            font_options = [
-                "/System/Library/Fonts/Arial.ttf",  # macOS
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Linux
-                "/usr/share/fonts/TTF/Arial.ttf",  # Some Linux distros
-            ]
-
-            self.font = None
-            for font_path in font_options:
-                if os.path.exists(font_path):
-                    self.font = ImageFont.truetype(font_path, self.font_size)
-                    break
-
-            if self.font is None:
-                self.font = ImageFont.load_default()
-                logger.warning("Using default font - text may not display optimally")
-        except Exception as e:
-            logger.warning(f"Could not load system font: {e}")
-            self.font = ImageFont.load_default()
+        # Font setup; glyphs are rasterized once and drawn into a framebuffer
+        # mirroring the panel, so each tick allocates no images
+        self.font = load_font(self.font_size)
+        self.text = TextRenderer(self.font)
+        self.frame = FrameBuffer(self.epd.width, self.epd.height)
+        # glyph_boxes() of the text on the panel, to diff each tick against
+        self.shown_glyphs = []
+
+    @property
+    def text_rect(self):
+        return Rect(
+            self.text_x,
+            self.text_y,
+            self.text_x + self.text_width,
+            self.text_y + self.text_height,
+        )
+
+    def render_text(self, text):
+        """
+        Draw text centred in the text region of the framebuffer
+
+        Returns:
+            The glyph_boxes() of the text as drawn
+        """
+        self.frame.fill_rect(self.text_rect)
+
+        x0, y0, x1, y1 = self.text.bbox(text)
+        x = self.text_x + (self.text_width - (x1 - x0)) // 2
+        y = self.text_y + (self.text_height - (y1 - y0)) // 2
+        self.text.draw(self.frame, text, x, y)
+        return self.text.glyph_boxes(text, x, y)
 
     def create_text_image(self, text):
         """Create an image with the given text"""
-        # Create full-size image for the display
-        image = Image.new("1", (self.epd.width, self.epd.height), self.bg_color)
-        draw = ImageDraw.Draw(image)
-
-        # Get text bounding box
-        bbox = draw.textbbox((0, 0), text, font=self.font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-
-        # Center the text within the text region
-        x = self.text_x + (self.text_width - text_width) // 2
-        y = self.text_y + (self.text_height - text_height) // 2
-
-        # Draw text
-        draw.text((x, y), text, fill=self.text_color, font=self.font)
-
-        return image
+        self.render_text(text)
+        return self.frame.to_image()
 
     def get_text_buffer(self, text):
         """Convert text image to buffer for display_Partial"""
-        # Calculate buffer size based on display_Partial logic
-        x_start = self.text_x
-        x_end = self.text_x + self.text_width
-        y_start = self.text_y
-        y_end = self.text_y + self.text_height
-
-        # Apply the same boundary adjustments as display_Partial
-        if (
-            (x_start % 8 + x_end % 8 == 8 & x_start % 8 > x_end % 8)
-            | x_start % 8 + x_end % 8
-            == 0 | (x_end - x_start) % 8
-            == 0
-        ):
-            x_start = x_start // 8 * 8
-            x_end = x_end // 8 * 8
-        else:
-            x_start = x_start // 8 * 8
-            if x_end % 8 == 0:
-                x_end = x_end // 8 * 8
-            else:
-                x_end = x_end // 8 * 8 + 1
-
-        width_bytes = (x_end - x_start) // 8
-        height = y_end - y_start
-
-        # Create the text image for the region
-        region_image = Image.new("1", (x_end - x_start, height), self.bg_color)
-        draw = ImageDraw.Draw(region_image)
-
-        # Get text bounding box
-        bbox = draw.textbbox((0, 0), text, font=self.font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-
-        # Center the text in the region
-        text_x = (region_image.width - text_width) // 2
-        text_y = (region_image.height - text_height) // 2
-
-        # Draw text
-        draw.text((text_x, text_y), text, fill=self.text_color, font=self.font)
-
-        # Convert to buffer
-        img = region_image.convert("1")
-        buf = bytearray(img.tobytes("raw"))
-
-        # Invert the bytes (same as getbuffer does)
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-
-        return buf
+        self.render_text(text)
+        # display_Partial takes the framebuffer's layout (1 = white) for the
+        # byte-aligned window around the region
+        return self.frame.window(self.text_rect)
+
+    def prepare_frame(self, value, shown_glyphs=None):
+        """
+        Render a counter value and the data needed to show it
+
+        Only the byte-aligned window around the glyphs that differ from
+        shown_glyphs is kept ("Counter 41" -> "Counter 42" sends one digit);
+        without shown_glyphs the frame is a full display.
+        """
+        glyphs = self.render_text(f"Counter {value}")
+        if shown_glyphs is None:
+            return CounterFrame(value, glyphs, None, self.frame.tobytes())
+
+        changed = changed_glyphs(shown_glyphs, glyphs)
+        if not changed:
+            return CounterFrame(value, glyphs, Rect(0, 0, 0, 0), b"")
+        window = align_rect(
+            clip_rect(bounding_box(changed), self.epd.width, self.epd.height)
+        )
+        return CounterFrame(value, glyphs, window, self.frame.window(window))
+
+    def show_frame(self, frame):
+        """Send a prepared frame to the panel"""
+        logger.info(f"Updating display: Counter {frame.value}")
+        window = frame.window
+        if window is None:
+            # Straight from the framebuffer with a blank red plane
+            self.epd.display_planes(frame.data)
+        elif not window.is_empty():
+            logger.debug(f"Refreshing {window} ({window.byte_count} bytes)")
+            self.epd.display_Partial(
+                frame.data, window.x0, window.y0, window.x1, window.y1
+            )
+        self.counter = frame.value
+        self.shown_glyphs = frame.glyphs
 
     def update_display(self, use_partial=True):
         """Update the display with the current counter value"""
-        text = f"Counter {self.counter}"
-        logger.info(f"Updating display: {text}")
-
-        if use_partial and self.counter > 0:
-            # Use partial display for updates after the first display
-            buffer = self.get_text_buffer(text)
-
-            # Calculate region coordinates
-            x_start = self.text_x
-            y_start = self.text_y
-            x_end = self.text_x + self.text_width
-            y_end = self.text_y + self.text_height
-
-            # Update the specific region
-            self.epd.display_Partial(buffer, x_start, y_start, x_end, y_end)
-        else:
-            # Full display for the first time
-            image = self.create_text_image(text)
-            buffer = self.epd.getbuffer(image)
-            # Create a blank red buffer (no red content)
-            red_buffer = [0x00] * (int(self.epd.width / 8) * self.epd.height)
-            self.epd.display(buffer, red_buffer)
+        # Partial display for updates after the first display
+        shown = self.shown_glyphs if use_partial and self.counter > 0 else None
+        self.show_frame(self.prepare_frame(self.counter, shown))
 
     def run(self, duration_seconds=None):
-        """Run the counter display"""
+        """
+        Run the counter display
+
+        The counter shows the whole seconds since the start: ticks are due
+        on absolute deadlines, the next value is rendered while the panel
+        refreshes, and values whose deadline passed during a slow refresh
+        are skipped rather than shown late.
+        """
+        scheduler = TickScheduler(
+            self.tick_seconds,
+            lambda tick, previous: self.prepare_frame(
+                tick, previous.glyphs if previous else None
+            ),
+            self.show_frame,
+        )
         try:
             logger.info("Starting counter display...")
-
-            # Initial display
-            self.update_display(use_partial=False)
-
-            start_time = time.time()
-
-            while True:
-                # Check if we should stop
-                if duration_seconds and (time.time() - start_time) >= duration_seconds:
-                    logger.info(
-                        f"Display duration completed ({duration_seconds} seconds)"
-                    )
-                    break
-
-                # Wait for 1 second
-                time.sleep(1)
-
-                # Increment counter
-                self.counter += 1
-
-                # Update display
-                self.update_display(use_partial=True)
+            asyncio.run(scheduler.run(duration_seconds))
+            if duration_seconds:
+                logger.info(f"Display duration completed ({duration_seconds} seconds)")
 
         except KeyboardInterrupt:
             logger.info("Counter display stopped by user")
         except Exception as e:
             logger.error(f"Error in counter display: {e}")
         finally:
+            stats = scheduler.stats()
+            logger.info(
+                f"Achieved {stats['achieved_fps']:.2f} of {stats['target_fps']:.2f} fps, "
+                f"{stats['shown']} shown, {stats['skipped']} skipped, "
+                f"late by {stats['late_ms_mean']:.0f} ms on average"
+            )
             # Put display to sleep
             logger.info("Putting display to sleep...")
             self.epd.sleep()
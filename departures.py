@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Transport for NSW departure board on the e-paper display
+
+Polls the departure monitor for a stop and refreshes only the rows that
+changed since the last poll:
+
+    TFNSW_API_KEY=... python3 departures.py 213891 --title "Rhodes"
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the lib directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from waveshare_epd import epd7in5b_V2
+from departure_board import DepartureBoard
+from geometry import Rect
+from text_renderer import TextRenderer, load_font
+from transport_api import TransportNSWAPI
+from widgets import ALIGN_RIGHT, Rectangle, Screen, Text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="E-paper departure board")
+    parser.add_argument("stop_id", help="Transport for NSW stop ID")
+    parser.add_argument("--title", help="Heading shown above the departures")
+    parser.add_argument(
+        "--interval", type=float, default=30.0, help="Seconds between polls"
+    )
+    parser.add_argument(
+        "--exclude-modes",
+        type=int,
+        nargs="*",
+        help="Transport modes to leave out (1=train, 5=bus, ...)",
+    )
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("TFNSW_API_KEY"),
+        help="API key (defaults to TFNSW_API_KEY)",
+    )
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or TFNSW_API_KEY)")
+
+    api = TransportNSWAPI(args.api_key)
+    epd = epd7in5b_V2.EPD()
+
+    logger.info("Initializing e-paper display for partial updates...")
+    if epd.init_part() != 0:
+        logger.error("Failed to initialize e-paper display")
+        sys.exit(1)
+    epd.Clear()
+
+    heading = TextRenderer(load_font(40))
+    rows = TextRenderer(load_font(30))
+    screen = Screen(epd.width, epd.height)
+    screen.add(Text(Rect(20, 10, 600, 70), heading, args.title or args.stop_id))
+    clock = screen.add(Text(Rect(600, 10, 780, 70), heading, align=ALIGN_RIGHT))
+    screen.add(Rectangle(Rect(20, 72, 780, 75)))
+    board = DepartureBoard(screen, rows, Rect(20, 84, 780, epd.height - 12))
+
+    try:
+        first = True
+        next_poll = time.monotonic()
+        while True:
+            try:
+                departures = api.get_departures_summary(
+                    args.stop_id, exclude_modes=args.exclude_modes
+                )
+            except Exception as e:
+                logger.error(f"Failed to fetch departures: {e}")
+                departures = None
+
+            clock.set_text(datetime.now().strftime("%H:%M"))
+            if departures is not None:
+                diff = board.update(departures)
+                logger.info(
+                    f"{len(diff['changed'])} changed, {len(diff['added'])} added, "
+                    f"{len(diff['removed'])} removed, {len(diff['moved'])} moved"
+                )
+
+            if first:
+                # One full refresh for the initial board, then partials
+                screen.render()
+                epd.display_planes(screen.frame.tobytes())
+                screen.commit()
+                first = False
+            else:
+                windows = screen.flush(epd)
+                logger.info(f"Refreshed {len(windows)} windows")
+
+            next_poll += args.interval
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+    except KeyboardInterrupt:
+        logger.info("Departure board stopped by user")
+    finally:
+        logger.info("Putting display to sleep...")
+        epd.sleep()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,22 +8,24 @@ import argparse
 # Add the lib directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
 
+from dither import DEFAULT_MODE, MODES, dither
+from framebuffer import FrameBuffer
+from geometry import Rect, align_rect
+
 # E-Paper display dimensions
 EPD_WIDTH = 800
 EPD_HEIGHT = 480
 
 
-def update_single_region(epd, region_image, x, y, width, height):
+def update_single_region(
+    epd, region_image, x, y, width, height, dither_mode=DEFAULT_MODE
+):
     """Update a single region of the e-paper display"""
     try:
         # Prepare the region image
-        region_image = prepare_image_for_epd(region_image)
-
-        # Ensure the region image matches the expected size
-        if region_image.size != (width, height):
-            region_image = region_image.resize(
-                (width, height), Image.Resampling.LANCZOS
-            )
+        region_image = prepare_region_for_epd(
+            region_image, width, height, dither_mode, origin=(x, y)
+        )
 
         # Calculate the region boundaries
         x_min, y_min = x, y
@@ -35,29 +37,19 @@ def update_single_region(epd, region_image, x, y, width, height):
         x_max = int(x_max)
         y_max = int(y_max)
 
-        # Align region boundaries to 8-byte boundaries for e-paper
-        if (
-            (x_min % 8 + x_max % 8 == 8 and x_min % 8 > x_max % 8)
-            or x_min % 8 + x_max % 8 == 0
-            or (x_max - x_min) % 8 == 0
-        ):
-            x_min = x_min // 8 * 8
-            x_max = x_max // 8 * 8
-        else:
-            x_min = x_min // 8 * 8
-            if x_max % 8 == 0:
-                x_max = x_max // 8 * 8
-            else:
-                x_max = x_max // 8 * 8 + 1
+        # Expand the region to the byte-aligned window the panel refreshes
+        window = align_rect(Rect(x_min, y_min, x_max, y_max))
+        x_min, x_max = window.x0, window.x1
 
         print(f"Updating region: ({x_min},{y_min}) to ({x_max},{y_max})")
 
-        # Crop the region from the full image
-        region_image_cropped = region_image.crop((0, 0, width, height))
+        # Shift the region's pixels into the window. There is no copy of the
+        # panel contents here, so the padding pixels around it become white
+        frame = FrameBuffer(window.width, window.height)
+        frame.paste(region_image, x - window.x0, 0)
 
-        # Convert to 1-bit and get buffer (for partial updates, don't invert bytes)
-        region_image_1bit = region_image_cropped.convert("1")
-        buffer = bytearray(region_image_1bit.tobytes("raw"))
+        # Get buffer (for partial updates, don't invert bytes)
+        buffer = frame.tobytes()
 
         # Update the region using display_Partial
         epd.display_Partial(buffer, x_min, y_min, x_max, y_max)
@@ -73,21 +65,31 @@ def update_single_region(epd, region_image, x, y, width, height):
         return False
 
 
-def prepare_image_for_epd(image):
-    """Convert image to e-paper format (black and white, correct dimensions)"""
-    print(f"Original image size: {image.size}, mode: {image.mode}")
+def prepare_region_for_epd(
+    image, width, height, dither_mode=DEFAULT_MODE, origin=(0, 0)
+):
+    """
+    Convert a region image to 1-bit e-paper format at the region's size
 
-    # Resize to e-paper dimensions
-    image = image.resize((EPD_WIDTH, EPD_HEIGHT), Image.Resampling.LANCZOS)
-    print(f"Resized image size: {image.size}")
+    origin is the region's position on the screen, so ordered dither modes
+    line up with the rest of the frame (see dither.dither).
+    """
+    # Resample only the region's own pixels, and only if its size is off,
+    # then dither once; there is no round trip through the full screen size
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    return dither(image, dither_mode, origin)
 
-    # Convert to 1-bit (black and white)
-    if image.mode != "1":
-        image = image.convert("1")
 
-    print(f"Final image size: {image.size}, mode: {image.mode}")
+def prepare_image_for_epd(image, dither_mode=DEFAULT_MODE):
+    """Convert image to e-paper format (black and white, correct dimensions)"""
+    # Resize to e-paper dimensions, unless the frame already has them
+    if image.size != (EPD_WIDTH, EPD_HEIGHT):
+        image = image.resize((EPD_WIDTH, EPD_HEIGHT), Image.Resampling.LANCZOS)
 
-    return image
+    # Convert to 1-bit (black and white)
+    return dither(image, dither_mode)
 
 
 def main():
@@ -103,6 +105,12 @@ def main():
         metavar=("X", "Y", "WIDTH", "HEIGHT"),
         help="Update a specific region (x, y, width, height)",
     )
+    parser.add_argument(
+        "--dither",
+        choices=MODES,
+        default=DEFAULT_MODE,
+        help="How grey levels are converted to black and white",
+    )
 
     args = parser.parse_args()
 
@@ -141,7 +149,9 @@ def main():
 
             # Update the specific region
             x, y, width, height = region_coords
-            success = update_single_region(epd, new_image, x, y, width, height)
+            success = update_single_region(
+                epd, new_image, x, y, width, height, args.dither
+            )
 
             if success:
                 print("Region update completed successfully")
@@ -152,7 +162,9 @@ def main():
         else:
             # Full image update mode
             # Prepare image for e-paper
-            new_epd_image = prepare_image_for_epd(new_image)
+            print(f"Original image size: {new_image.size}, mode: {new_image.mode}")
+            new_epd_image = prepare_image_for_epd(new_image, args.dither)
+            print(f"Final image size: {new_epd_image.size}, mode: {new_epd_image.mode}")
 
             # Use fast initialization for full image updates
             print("Full image - using fast initialization")
@@ -164,10 +176,8 @@ def main():
 
             # Display full image
             print("Displaying full image")
-            buffer = epd.getbuffer(new_epd_image)
-            # Create a blank red buffer (no red content) - same as counter example
-            red_buffer = [0x00] * (int(EPD_WIDTH / 8) * EPD_HEIGHT)
-            epd.display(buffer, red_buffer)
+            # Sent straight from the image bytes, with a blank red plane
+            epd.display_image(new_epd_image)
             print("Full image displayed successfully")
 
         # Keep display awake for faster subsequent updates
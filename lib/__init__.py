@@ -1,13 +1,8 @@
 # E-Paper Display Library
 # This package provides modular display implementations for e-paper displays
+#
+# The modules import each other (and waveshare_epd) as top-level modules:
+# scripts add lib/ to sys.path and import e.g. display_factory directly.
 
 __version__ = "1.0.0"
 __author__ = "Al Shahed"
-
-# Import main classes for easier access
-from .display_interface import DisplayInterface
-from .display_factory import DisplayFactory
-from .hardware_display import HardwareDisplay
-from .simulation_display import SimulationDisplay
-
-__all__ = ["DisplayInterface", "DisplayFactory", "HardwareDisplay", "SimulationDisplay"]
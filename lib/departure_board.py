@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Departure board that redraws only the rows whose visible fields changed
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from geometry import Rect
+from text_renderer import TextRenderer
+from widgets import ALIGN_RIGHT, Screen, TableRow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROW_HEIGHT = 48
+
+# Pixels kept clear between the text of adjacent columns
+COLUMN_GAP = 10
+
+ELLIPSIS = "\u2026"
+
+
+def row_key(departure: Dict[str, Any]) -> str:
+    """
+    Identity of a departure across polls
+
+    The realtime trip ID when the API provides one, otherwise the line,
+    destination and planned time, none of which change as a trip runs late.
+    """
+    if departure.get("trip_id"):
+        return departure["trip_id"]
+    return "|".join(
+        str(departure.get(field, ""))
+        for field in ("line", "destination", "time_planned")
+    )
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def minutes_until(departure: Dict[str, Any], now: Optional[datetime] = None):
+    """Whole minutes until a departure leaves, or None if unknown"""
+    when = _parse_time(departure.get("departure_time", ""))
+    if when is None:
+        return departure.get("minutes_from_now")
+    if now is None:
+        now = datetime.now(when.tzinfo)
+    return int((when - now).total_seconds() / 60)
+
+
+def delay_minutes(departure: Dict[str, Any]) -> int:
+    """Minutes between the planned and estimated HH:MM times, 0 if unknown"""
+    try:
+        planned = datetime.strptime(departure["time_planned"], "%H:%M")
+        estimated = datetime.strptime(departure["time_estimated"], "%H:%M")
+    except (KeyError, TypeError, ValueError):
+        return 0
+    # Wrap around midnight to the nearest difference
+    minutes = int((estimated - planned).total_seconds() // 60) % 1440
+    return minutes - 1440 if minutes > 720 else minutes
+
+
+def default_columns(width: int) -> List:
+    """Line, destination, countdown and delay flag columns across width pixels"""
+    return [90, width - 90 - 150 - 80, (150, ALIGN_RIGHT), (80, ALIGN_RIGHT)]
+
+
+def fit_text(renderer: TextRenderer, text: str, width: int) -> str:
+    """
+    text, or its longest prefix followed by an ellipsis, whose ink fits
+    within width pixels
+    """
+
+    def fits(candidate: str) -> bool:
+        x0, _, x1, _ = renderer.bbox(candidate)
+        return x1 - x0 <= width
+
+    if fits(text):
+        return text
+    # Binary search for the longest prefix that still fits
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(text[:middle].rstrip() + ELLIPSIS):
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + ELLIPSIS if low else ""
+
+
+def row_values(departure: Dict[str, Any], now: Optional[datetime] = None):
+    """The text shown in each column for a departure"""
+    minutes = minutes_until(departure, now)
+    if minutes is None:
+        due = departure.get("time_estimated") or departure.get("time_planned", "")
+    elif minutes <= 0:
+        due = "Now"
+    else:
+        due = f"{minutes} min"
+
+    delay = delay_minutes(departure) if departure.get("is_realtime") else 0
+    flag = f"{delay:+d}" if delay else ""
+    return [
+        str(departure.get("line", "")),
+        str(departure.get("destination", "")),
+        due,
+        flag,
+    ]
+
+
+class DepartureBoard:
+    """
+    Departures from get_departures_summary() as keyed TableRows on a Screen
+
+    Each poll is matched to the rows on the board by row_key(): rows for
+    departures that have gone are removed, surviving rows move up if the
+    ones above them left, and only cells whose text changed are redrawn.
+    A typical poll (countdowns ticking down, a delay appearing) leaves a few
+    cell-sized dirty windows, which Screen.flush() sends as one or two
+    partial refreshes instead of a full-screen flash.
+    """
+
+    def __init__(
+        self,
+        screen: Screen,
+        renderer: TextRenderer,
+        rect: Rect,
+        row_height: int = DEFAULT_ROW_HEIGHT,
+        columns: Optional[Sequence] = None,
+    ):
+        self.screen = screen
+        self.renderer = renderer
+        self.rect = rect
+        self.row_height = row_height
+        self.columns = columns or default_columns(rect.width)
+        self.widths = [
+            column[0] if isinstance(column, tuple) else column
+            for column in self.columns
+        ]
+        self.max_rows = rect.height // row_height
+        self.rows: Dict[str, TableRow] = {}
+
+    def slot(self, index: int) -> Rect:
+        y = self.rect.y0 + index * self.row_height
+        return Rect(self.rect.x0, y, self.rect.x1, y + self.row_height)
+
+    def fit_values(self, values: Sequence[str]) -> List[str]:
+        """Values truncated with an ellipsis to their column widths"""
+        return [
+            fit_text(self.renderer, value, max(0, width - COLUMN_GAP))
+            for value, width in zip(values, self.widths)
+        ]
+
+    def update(
+        self, departures: List[Dict[str, Any]], now: Optional[datetime] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Show a new poll of departures, in the order given
+
+        Returns:
+            Keys of the rows "added", "removed", "moved" and "changed"
+        """
+        diff = {"added": [], "removed": [], "moved": [], "changed": []}
+        shown = {}
+        for departure in departures:
+            if len(shown) == self.max_rows:
+                break
+            key = row_key(departure)
+            if key in shown:
+                continue
+            values = self.fit_values(row_values(departure, now))
+            # Duplicates are skipped without using up a slot
+            slot = self.slot(len(shown))
+            row = self.rows.get(key)
+            if row is None:
+                row = TableRow(slot, self.renderer, self.columns, values)
+                self.screen.add(row)
+                diff["added"].append(key)
+            else:
+                if row.rect != slot:
+                    row.move(slot)
+                    diff["moved"].append(key)
+                if row.values != values:
+                    row.set_values(values)
+                    diff["changed"].append(key)
+            shown[key] = row
+
+        for key, row in self.rows.items():
+            if key not in shown:
+                self.screen.remove(row)
+                diff["removed"].append(key)
+        self.rows = shown
+
+        logger.debug(
+            "Departure board: "
+            + ", ".join(f"{len(keys)} {name}" for name, keys in diff.items())
+        )
+        return diff
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Factory for e-paper display backends
+"""
+
+import logging
+import os
+from typing import Optional
+
+from display_interface import DisplayInterface
+
+logger = logging.getLogger(__name__)
+
+
+class DisplayFactory:
+    """Creates display backends by name"""
+
+    HARDWARE = "hardware"
+    SIMULATION = "simulation"
+    BACKENDS = (HARDWARE, SIMULATION)
+
+    @classmethod
+    def create(cls, backend: Optional[str] = None, **kwargs) -> DisplayInterface:
+        """
+        Create a display backend
+
+        Args:
+            backend: "hardware" or "simulation"; defaults to the EPD_BACKEND
+                environment variable, or "hardware" if that is not set
+            **kwargs: Passed to the backend constructor
+
+        Returns:
+            A DisplayInterface implementation
+        """
+        backend = (backend or os.environ.get("EPD_BACKEND", cls.HARDWARE)).lower()
+        logger.info(f"Creating {backend} display backend")
+
+        if backend == cls.HARDWARE:
+            from hardware_display import HardwareDisplay
+
+            return HardwareDisplay(**kwargs)
+        elif backend == cls.SIMULATION:
+            from simulation_display import SimulationDisplay
+
+            return SimulationDisplay(**kwargs)
+
+        raise ValueError(
+            f"Unknown display backend '{backend}', expected one of: {', '.join(cls.BACKENDS)}"
+        )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Common interface for e-paper display backends
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class DisplayInterface(ABC):
+    """
+    Interface of a 7.5" e-paper display, matching waveshare_epd.epd7in5b_V2.EPD
+
+    Buffers follow the EPD conventions: getbuffer() returns black-plane bytes
+    with 1 = black, display() takes that buffer plus a red plane, and
+    display_Partial() takes packed window bytes with 1 = white.
+    display_image() skips the getbuffer() round trip for black/white images.
+    """
+
+    width: int
+    height: int
+    # 1 until the first partial update has written the old-data RAM
+    partFlag: int
+    # Total milliseconds spent waiting for the panel to become idle
+    busy_ms: float
+    # Refresh mode the panel is powered in; None when off or asleep
+    mode: Optional[str]
+
+    @abstractmethod
+    def init(self) -> int:
+        """Initialize for full refreshes; returns 0 on success"""
+
+    @abstractmethod
+    def init_Fast(self) -> int:
+        """Initialize for fast full refreshes; returns 0 on success"""
+
+    @abstractmethod
+    def init_part(self) -> int:
+        """Initialize for partial refreshes; returns 0 on success"""
+
+    @abstractmethod
+    def ensure_mode(self, mode: str) -> int:
+        """
+        Put the panel in "full", "fast" or "partial" mode, skipping the
+        reset when it is already there; returns 0 on success
+        """
+
+    @abstractmethod
+    def getbuffer(self, image):
+        """Convert a PIL image to a black-plane buffer"""
+
+    @abstractmethod
+    def display(self, imageblack, imagered):
+        """Write both planes and run a refresh"""
+
+    @abstractmethod
+    def display_image(self, image):
+        """Write a PIL image with a blank red plane and run a refresh"""
+
+    @abstractmethod
+    def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
+        """Write a window of the black plane and run a partial refresh"""
+
+    @abstractmethod
+    def Clear(self):
+        """Clear the display to white"""
+
+    @abstractmethod
+    def sleep(self):
+        """Power off and enter deep sleep"""
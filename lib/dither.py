@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Conversion of greyscale and colour images to 1-bit for the e-paper panel
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+THRESHOLD = "threshold"
+BAYER = "bayer"
+BLUE_NOISE = "blue-noise"
+FLOYD_STEINBERG = "floyd-steinberg"
+
+MODES = (THRESHOLD, BAYER, BLUE_NOISE, FLOYD_STEINBERG)
+# What PIL's convert("1") does, and so what every update used before
+DEFAULT_MODE = FLOYD_STEINBERG
+
+BAYER_SIZE = 8
+BLUE_NOISE_SIZE = 64
+# Standard deviation of the Gaussian energy filter used by void-and-cluster
+BLUE_NOISE_SIGMA = 1.5
+
+
+def validate_mode(mode: str) -> str:
+    if mode not in MODES:
+        raise ValueError(
+            f"Unknown dither mode {mode!r}, expected one of {', '.join(MODES)}"
+        )
+    return mode
+
+
+@lru_cache(maxsize=None)
+def bayer_matrix(size: int = BAYER_SIZE) -> np.ndarray:
+    """Ordered dither ranks 0..size*size-1 for a power-of-two size"""
+    matrix = np.zeros((1, 1), dtype=np.int32)
+    while matrix.shape[0] < size:
+        matrix = np.block(
+            [[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]]
+        )
+    return matrix
+
+
+def _energy_kernel(size: int, sigma: float) -> np.ndarray:
+    """Toroidal Gaussian centred on (0, 0), for np.roll to move around"""
+    d = np.minimum(np.arange(size), size - np.arange(size))
+    return np.exp(-(d[:, None] ** 2 + d[None, :] ** 2) / (2 * sigma**2))
+
+
+@lru_cache(maxsize=None)
+def blue_noise_matrix(
+    size: int = BLUE_NOISE_SIZE, sigma: float = BLUE_NOISE_SIGMA, seed: int = 0
+) -> np.ndarray:
+    """
+    Blue-noise ranks 0..size*size-1 made with Ulichney's void-and-cluster
+
+    The energy of a pattern is its minority pixels blurred with a wrapping
+    Gaussian; the tightest cluster is the minority pixel with the highest
+    energy and the largest void the empty pixel with the lowest. The energy
+    is updated incrementally as pixels are added or removed, so building the
+    default 64x64 mask takes well under a second and happens once.
+    """
+    kernel = _energy_kernel(size, sigma)
+
+    def splat(y, x):
+        return np.roll(kernel, (y, x), axis=(0, 1))
+
+    def energy_of(pattern):
+        energy = np.zeros((size, size))
+        for y, x in zip(*np.nonzero(pattern)):
+            energy += splat(y, x)
+        return energy
+
+    def tightest_cluster(pattern, energy):
+        return np.unravel_index(
+            np.where(pattern, energy, -np.inf).argmax(), energy.shape
+        )
+
+    def largest_void(pattern, energy):
+        return np.unravel_index(
+            np.where(pattern, np.inf, energy).argmin(), energy.shape
+        )
+
+    # Initial pattern: a tenth of the pixels at random, relaxed until moving
+    # the tightest cluster into the largest void no longer changes anything
+    rng = np.random.default_rng(seed)
+    count = size * size // 10
+    prototype = np.zeros((size, size), dtype=bool)
+    prototype.flat[rng.choice(size * size, count, replace=False)] = True
+    energy = energy_of(prototype)
+    while True:
+        cluster = tightest_cluster(prototype, energy)
+        prototype[cluster] = False
+        energy -= splat(*cluster)
+        void = largest_void(prototype, energy)
+        prototype[void] = True
+        energy += splat(*void)
+        if void == cluster:
+            break
+
+    ranks = np.zeros((size, size), dtype=np.int32)
+
+    # Ranks below the prototype's count: remove tightest clusters
+    pattern = prototype.copy()
+    energy = energy_of(pattern)
+    for rank in range(count - 1, -1, -1):
+        cluster = tightest_cluster(pattern, energy)
+        pattern[cluster] = False
+        energy -= splat(*cluster)
+        ranks[cluster] = rank
+
+    # Ranks above it: fill the largest voids until the mask is full
+    pattern = prototype.copy()
+    energy = energy_of(pattern)
+    for rank in range(count, size * size):
+        void = largest_void(pattern, energy)
+        pattern[void] = True
+        energy += splat(*void)
+        ranks[void] = rank
+
+    return ranks
+
+
+@lru_cache(maxsize=None)
+def threshold_map(mode: str) -> np.ndarray:
+    """Per-pixel thresholds for an ordered mode, spread evenly over 0..255"""
+    ranks = bayer_matrix() if mode == BAYER else blue_noise_matrix()
+    return ((ranks + 0.5) * (255.0 / ranks.size)).astype(np.float32)
+
+
+def _tile(matrix: np.ndarray, width: int, height: int, origin: Tuple[int, int]):
+    """The matrix repeated over a width x height area at origin on the screen"""
+    size = matrix.shape[0]
+    ox, oy = origin
+    rows = (np.arange(height) + oy) % size
+    columns = (np.arange(width) + ox) % size
+    return matrix[rows[:, None], columns[None, :]]
+
+
+def _from_mask(white: np.ndarray) -> Image.Image:
+    """Mode "1" image from a boolean array, True = white"""
+    height, width = white.shape
+    return Image.frombytes("1", (width, height), np.packbits(white, axis=1).tobytes())
+
+
+def dither(
+    image: Image.Image, mode: str = DEFAULT_MODE, origin: Tuple[int, int] = (0, 0)
+) -> Image.Image:
+    """
+    Convert an image to mode "1" with the given dither mode
+
+    THRESHOLD cuts at mid-grey. BAYER and BLUE_NOISE compare each pixel
+    with a threshold map tiled over the whole screen; origin is where the
+    image sits on it, so a region is dithered exactly like the same pixels
+    of a full frame, and a pixel only flips when its own grey level changes.
+    That keeps partial refreshes small for animated content. FLOYD_STEINBERG
+    is PIL's error diffusion: the best tone reproduction, but one changed
+    pixel can flip many others after it.
+    """
+    validate_mode(mode)
+    if image.mode == "1":
+        return image
+
+    if mode == FLOYD_STEINBERG:
+        return image.convert("1")
+
+    grey = np.asarray(image.convert("L"))
+    if mode == THRESHOLD:
+        return _from_mask(grey >= 128)
+
+    height, width = grey.shape
+    thresholds = _tile(threshold_map(mode), width, height, origin)
+    return _from_mask(grey > thresholds)
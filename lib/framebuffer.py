@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+In-memory packed 1bpp framebuffer mirroring the e-paper panel RAM
+"""
+
+import numpy as np
+from PIL import Image
+
+from typing import List
+
+from geometry import Rect, align_rect, clip_rect
+
+
+class PackedBitmap:
+    """
+    Packed 1bpp pixel data in the FrameBuffer bit layout, with each row
+    padded to a whole number of bytes. The data is referenced, not copied.
+    """
+
+    def __init__(self, data, width: int, height: int):
+        self.stride = (width + 7) // 8
+        if len(data) != self.stride * height:
+            raise ValueError(
+                f"Expected {self.stride * height} bytes for a {width}x{height} bitmap, got {len(data)}"
+            )
+        self.data = memoryview(data)
+        self.width = width
+        self.height = height
+
+    def to_array(self) -> np.ndarray:
+        """Rows of packed bytes as a (height, stride) array view"""
+        return np.frombuffer(self.data, dtype=np.uint8).reshape(
+            self.height, self.stride
+        )
+
+    def to_image(self) -> Image.Image:
+        return Image.frombytes("1", (self.width, self.height), bytes(self.data))
+
+
+class FrameBuffer:
+    """
+    Packed 1bpp framebuffer in the same bit layout as PIL's mode "1" raw
+    bytes: MSB first, 1 = white, 0 = black, one row every `stride` bytes.
+    """
+
+    def __init__(self, width: int, height: int, fill: int = 0xFF):
+        self.width = width
+        self.height = height
+        self.stride = (width + 7) // 8
+        self.data = np.full((height, self.stride), fill, dtype=np.uint8)
+
+    @property
+    def bounds(self) -> Rect:
+        return Rect(0, 0, self.width, self.height)
+
+    def fill(self, value: int = 0xFF):
+        """Fill the whole framebuffer with a byte value"""
+        self.data[:] = value
+
+    def fill_rect(self, rect: Rect, white: bool = True) -> Rect:
+        """Set every pixel of a rectangle, clipped to the display"""
+        rect = clip_rect(rect, self.width, self.height)
+        if rect.is_empty():
+            return rect
+        value = 0xFF if white else 0x00
+        src = np.full((rect.height, (rect.width + 7) // 8), value, dtype=np.uint8)
+        blit_packed(self.data, src, rect.x0, rect.y0, rect.width)
+        return rect
+
+    def copy_rect(self, other: "FrameBuffer", rect: Rect) -> Rect:
+        """Copy the pixels of a rectangle from a framebuffer of the same size"""
+        rect = clip_rect(rect, self.width, self.height)
+        if rect.is_empty():
+            return rect
+        b0, b1 = rect.x0 // 8, (rect.x1 + 7) // 8
+        mask_bits = np.zeros((b1 - b0) * 8, dtype=bool)
+        mask_bits[rect.x0 - b0 * 8 : rect.x1 - b0 * 8] = True
+        mask = np.packbits(mask_bits)
+        target = self.data[rect.y0 : rect.y1, b0:b1]
+        source = other.data[rect.y0 : rect.y1, b0:b1]
+        target[:] = (target & ~mask) | (source & mask)
+        return rect
+
+    def copy(self) -> "FrameBuffer":
+        clone = FrameBuffer(self.width, self.height)
+        clone.data[:] = self.data
+        return clone
+
+    def assign(self, other: "FrameBuffer"):
+        """Overwrite this framebuffer's contents with another's"""
+        self.data[:] = other.data
+
+    def dirty_rects(self, other: "FrameBuffer") -> List[Rect]:
+        """
+        Byte-aligned rectangles covering every pixel that differs from other
+
+        The packed rows are XORed as a whole, then consecutive changed rows
+        are grouped into bands and each band is split into runs of changed
+        byte columns, so unchanged pixels outside those runs are never sent.
+        """
+        changed = np.bitwise_xor(self.data, other.data)
+        changed_rows = np.flatnonzero(changed.any(axis=1))
+        if changed_rows.size == 0:
+            return []
+
+        rects = []
+        for band in _runs(changed_rows):
+            band_rows = changed[band[0] : band[-1] + 1]
+            for columns in _runs(np.flatnonzero(band_rows.any(axis=0))):
+                # Tighten the band to the rows that change inside this run
+                rows = np.flatnonzero(
+                    band_rows[:, columns[0] : columns[-1] + 1].any(axis=1)
+                )
+                rects.append(
+                    Rect(
+                        int(columns[0]) * 8,
+                        int(band[0] + rows[0]),
+                        min((int(columns[-1]) + 1) * 8, self.width),
+                        int(band[0] + rows[-1]) + 1,
+                    )
+                )
+        return rects
+
+    def paste(self, image, x: int, y: int) -> Rect:
+        """
+        Composite an image into the framebuffer at (x, y)
+
+        Args:
+            image: PIL image (converted to mode "1" if needed) or PackedBitmap
+            x, y: Top-left position in display coordinates
+
+        Returns:
+            The rectangle that was written, clipped to the display
+        """
+        if isinstance(image, PackedBitmap):
+            return self.paste_packed(image, x, y)
+
+        if image.mode != "1":
+            image = image.convert("1")
+
+        full = Rect(x, y, x + image.width, y + image.height)
+        rect = clip_rect(full, self.width, self.height)
+        if rect.is_empty():
+            return rect
+        if rect != full:
+            image = image.crop((rect.x0 - x, rect.y0 - y, rect.x1 - x, rect.y1 - y))
+
+        blit_packed(
+            self.data,
+            PackedBitmap(image.tobytes("raw"), rect.width, rect.height).to_array(),
+            rect.x0,
+            rect.y0,
+            rect.width,
+        )
+        return rect
+
+    def paste_packed(self, bitmap: PackedBitmap, x: int, y: int) -> Rect:
+        """
+        Composite packed 1bpp data into the framebuffer at (x, y)
+
+        Bitmaps that fit on the display are bit-shifted into place without
+        unpacking; ones that are partly off-screen are cropped first.
+        """
+        full = Rect(x, y, x + bitmap.width, y + bitmap.height)
+        rect = clip_rect(full, self.width, self.height)
+        if rect.is_empty():
+            return rect
+        if rect != full:
+            return self.paste(bitmap.to_image(), x, y)
+
+        blit_packed(self.data, bitmap.to_array(), x, y, bitmap.width)
+        return rect
+
+    def window(self, rect: Rect) -> bytes:
+        """Packed bytes of a byte-aligned window, ready for display_Partial"""
+        rect = align_rect(rect)
+        return self.data[rect.y0 : rect.y1, rect.x0 // 8 : rect.x1 // 8].tobytes()
+
+    def tobytes(self) -> bytes:
+        return self.data.tobytes()
+
+    def to_image(self) -> Image.Image:
+        return Image.frombytes("1", (self.width, self.height), self.tobytes())
+
+
+def blit_packed(dst: np.ndarray, src: np.ndarray, x: int, y: int, width: int):
+    """
+    Copy packed 1bpp rows into packed rows at any pixel offset
+
+    The source rows are shifted right by x % 8 bits as whole bytes and
+    merged into the destination under a mask, so pixels on either side of
+    the source in the first and last destination bytes are kept.
+
+    Args:
+        dst: (rows, stride) uint8 destination, e.g. FrameBuffer.data
+        src: (height, src_stride) uint8 source rows, MSB first
+        x, y: Destination position of the source's top-left pixel
+        width: Source width in pixels; padding bits beyond it are ignored
+    """
+    height = src.shape[0]
+    shift = x % 8
+    bx = x // 8
+    byte_count = (shift + width + 7) // 8
+
+    if shift == 0:
+        shifted = src[:, :byte_count]
+    else:
+        shifted = np.zeros((height, src.shape[1] + 1), dtype=np.uint8)
+        shifted[:, :-1] = src >> shift
+        shifted[:, 1:] |= src << (8 - shift)
+        shifted = shifted[:, :byte_count]
+
+    target = dst[y : y + height, bx : bx + byte_count]
+    if shift == 0 and width % 8 == 0:
+        target[:] = shifted
+        return
+
+    mask_bits = np.zeros(byte_count * 8, dtype=bool)
+    mask_bits[shift : shift + width] = True
+    mask = np.packbits(mask_bits)
+    target[:] = (target & ~mask) | (shifted & mask)
+
+
+def _runs(indices: np.ndarray) -> List[np.ndarray]:
+    """Split sorted indices into runs of consecutive values"""
+    return np.split(indices, np.flatnonzero(np.diff(indices) != 1) + 1)
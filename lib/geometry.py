@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Rectangle helpers for e-paper partial refresh windows
+"""
+
+from typing import Iterable, List, NamedTuple
+
+from waveshare_epd.epd7in5b_V2 import byte_align
+
+
+class Rect(NamedTuple):
+    """Axis-aligned rectangle with exclusive end coordinates"""
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    @property
+    def width(self) -> int:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> int:
+        return self.y1 - self.y0
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+    @property
+    def byte_count(self) -> int:
+        """Bytes needed to send this rectangle as a packed 1bpp window"""
+        return (self.width + 7) // 8 * self.height
+
+    def is_empty(self) -> bool:
+        return self.x1 <= self.x0 or self.y1 <= self.y0
+
+    def union(self, other: "Rect") -> "Rect":
+        return Rect(
+            min(self.x0, other.x0),
+            min(self.y0, other.y0),
+            max(self.x1, other.x1),
+            max(self.y1, other.y1),
+        )
+
+    def intersects(self, other: "Rect") -> bool:
+        return (
+            self.x0 < other.x1
+            and other.x0 < self.x1
+            and self.y0 < other.y1
+            and other.y0 < self.y1
+        )
+
+    def contains(self, other: "Rect") -> bool:
+        return (
+            self.x0 <= other.x0
+            and self.y0 <= other.y0
+            and self.x1 >= other.x1
+            and self.y1 >= other.y1
+        )
+
+
+def align_rect(rect: Rect) -> Rect:
+    """Expand a rectangle horizontally to whole bytes (multiples of 8 pixels)"""
+    x0, x1 = byte_align(rect.x0, rect.x1)
+    return Rect(x0, rect.y0, x1, rect.y1)
+
+
+def clip_rect(rect: Rect, width: int, height: int) -> Rect:
+    """Clip a rectangle to the display area"""
+    return Rect(
+        max(rect.x0, 0), max(rect.y0, 0), min(rect.x1, width), min(rect.y1, height)
+    )
+
+
+def bounding_box(rects: Iterable[Rect]) -> Rect:
+    """Smallest rectangle containing all of the given rectangles"""
+    rects = list(rects)
+    box = rects[0]
+    for rect in rects[1:]:
+        box = box.union(rect)
+    return box
+
+
+def windows_cost(
+    windows: Iterable[Rect], refresh_cost: float, byte_cost: float
+) -> float:
+    """Estimated cost of flushing a set of windows, one partial refresh each"""
+    return sum(refresh_cost + window.byte_count * byte_cost for window in windows)
+
+
+def _merge_touching(windows: List[Rect]) -> List[Rect]:
+    """Merge windows that share a full edge, which never costs extra bytes"""
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                a, b = windows[i], windows[j]
+                same_columns = a.x0 == b.x0 and a.x1 == b.x1
+                same_rows = a.y0 == b.y0 and a.y1 == b.y1
+                if (
+                    (same_columns and (a.y1 == b.y0 or b.y1 == a.y0))
+                    or (same_rows and (a.x1 == b.x0 or b.x1 == a.x0))
+                    or a.contains(b)
+                    or b.contains(a)
+                ):
+                    windows[i] = a.union(b)
+                    del windows[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return windows
+
+
+def coalesce_windows(
+    rects: Iterable[Rect], refresh_cost: float, byte_cost: float
+) -> List[Rect]:
+    """
+    Merge dirty rectangles into byte-aligned refresh windows
+
+    Every window costs one partial refresh plus the SPI time for its bytes.
+    Pairs of windows are greedily replaced by their bounding box while that
+    lowers the total cost, so the result is either a single bounding box or a
+    small set of windows when merging would send too many unchanged bytes.
+
+    Args:
+        rects: Dirty rectangles in display coordinates
+        refresh_cost: Cost of a single partial refresh (e.g. in ms)
+        byte_cost: Cost of sending one byte of window data (same unit)
+
+    Returns:
+        List of non-empty, byte-aligned windows
+    """
+    windows = [align_rect(rect) for rect in rects if not rect.is_empty()]
+    if not windows:
+        return []
+
+    # Any set of two or more windows costs at least two refreshes
+    box = bounding_box(windows)
+    if windows_cost([box], refresh_cost, byte_cost) <= 2 * refresh_cost:
+        return [box]
+
+    windows = _merge_touching(windows)
+
+    while len(windows) > 1:
+        best_saving = 0.0
+        best_pair = None
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                union = windows[i].union(windows[j])
+                absorbed = [w for w in windows if union.contains(w)]
+                saving = windows_cost(absorbed, refresh_cost, byte_cost) - windows_cost(
+                    [union], refresh_cost, byte_cost
+                )
+                if saving > best_saving:
+                    best_saving = saving
+                    best_pair = union
+        if best_pair is None:
+            break
+        windows = [w for w in windows if not best_pair.contains(w)] + [best_pair]
+
+    return windows
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Per-tile partial refresh counts for tracking ghosting on the panel
+"""
+
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+from geometry import Rect
+
+# Partial refreshes a tile may take before a clean refresh is scheduled
+DEFAULT_BUDGET = 30
+DEFAULT_TILE_SIZE = 80
+
+
+class GhostingTracker:
+    """
+    Counts the partial refreshes each tile of the panel has taken since the
+    last clean (full-screen) refresh
+
+    Ghosting builds up where partial refreshes repeat, so a small counter
+    region that refreshes every second crosses the budget long before the
+    rest of the screen.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        budget: int = DEFAULT_BUDGET,
+    ):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.budget = budget
+        rows = (height + tile_size - 1) // tile_size
+        columns = (width + tile_size - 1) // tile_size
+        self.counts = np.zeros((rows, columns), dtype=np.uint32)
+
+    def record(self, windows: Iterable[Rect]):
+        """Count one partial refresh for every tile each window touches"""
+        for window in windows:
+            if window.is_empty():
+                continue
+            t = self.tile_size
+            self.counts[
+                window.y0 // t : (window.y1 - 1) // t + 1,
+                window.x0 // t : (window.x1 - 1) // t + 1,
+            ] += 1
+
+    def reset(self):
+        """A clean refresh redraws every tile"""
+        self.counts.fill(0)
+
+    def worst(self) -> int:
+        """Highest partial refresh count of any tile"""
+        return int(self.counts.max())
+
+    def over_budget(self) -> bool:
+        return self.worst() >= self.budget
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "worst_tile": self.worst(),
+            "tiles_over_budget": int((self.counts >= self.budget).sum()),
+            "tile_size": self.tile_size,
+        }
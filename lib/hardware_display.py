@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Hardware e-paper display backend
+"""
+
+from display_interface import DisplayInterface
+from waveshare_epd import epdconfig
+from waveshare_epd.epd7in5b_V2 import EPD
+
+
+class HardwareDisplay(DisplayInterface):
+    """DisplayInterface backed by the real panel through waveshare_epd"""
+
+    def __init__(self, platform=None, **kwargs):
+        # platform picks the epdconfig backend (e.g. "mock"); by default it
+        # comes from EPD_PLATFORM or is detected on first use
+        if platform is not None:
+            epdconfig.use(platform)
+        # kwargs configure the EPD, e.g. busy_mode or busy_settle_ms
+        self.epd = EPD(**kwargs)
+        self.width = self.epd.width
+        self.height = self.epd.height
+
+    @property
+    def partFlag(self):
+        return self.epd.partFlag
+
+    @partFlag.setter
+    def partFlag(self, value):
+        self.epd.partFlag = value
+
+    @property
+    def mode(self):
+        return self.epd.mode
+
+    @property
+    def busy_ms(self):
+        return self.epd.busy_ms
+
+    def init(self):
+        return self.epd.init()
+
+    def init_Fast(self):
+        return self.epd.init_Fast()
+
+    def init_part(self):
+        return self.epd.init_part()
+
+    def ensure_mode(self, mode):
+        return self.epd.ensure_mode(mode)
+
+    def getbuffer(self, image):
+        return self.epd.getbuffer(image)
+
+    def display(self, imageblack, imagered):
+        self.epd.display(imageblack, imagered)
+
+    def display_image(self, image):
+        self.epd.display_image(image)
+
+    def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
+        self.epd.display_Partial(Image, Xstart, Ystart, Xend, Yend)
+
+    def Clear(self):
+        self.epd.Clear()
+
+    def sleep(self):
+        self.epd.sleep()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Minimal Prometheus-style metrics for the display update pipeline
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Default histogram buckets in seconds, from sub-millisecond image work up
+# to full refreshes of the panel
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+)
+
+
+def _format_labels(label_names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not label_names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(label_names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base class for a named metric with optional labels"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self._samples()
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for the metric's values"""
+
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: bucket counts, sum, count
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the wall-clock duration of a with-block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    bucket_labels = _format_labels(
+                        self.label_names + ("le",), key + (_format_value(bound),)
+                    )
+                    lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def counter(self, name: str, documentation: str, label_names=()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def histogram(
+        self, name: str, documentation: str, label_names=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def _register(self, metric: Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Update pipeline stages
+DECODE_SECONDS = REGISTRY.histogram(
+    "epd_decode_seconds", "Time spent decoding base64 and PNG image data"
+)
+CONVERT_SECONDS = REGISTRY.histogram(
+    "epd_convert_seconds", "Time spent resizing and converting images to 1bpp"
+)
+ALIGN_SECONDS = REGISTRY.histogram(
+    "epd_align_seconds",
+    "Time spent diffing the framebuffer and aligning dirty regions to windows",
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "epd_queue_wait_seconds", "Time updates wait in the queue before their flush"
+)
+BUSY_WAIT_SECONDS = REGISTRY.histogram(
+    "epd_busy_wait_seconds", "Time spent waiting for the panel BUSY pin", ["mode"]
+)
+SUBPROCESS_SECONDS = REGISTRY.histogram(
+    "epd_subprocess_seconds", "Duration of epd_updater.py fallback subprocesses"
+)
+PREDICTED_SECONDS = REGISTRY.histogram(
+    "epd_predicted_seconds",
+    "Refresh latency predicted by the refresh planner",
+    ["mode"],
+)
+UPDATE_SECONDS = REGISTRY.histogram(
+    "epd_update_seconds", "End-to-end update latency per endpoint", ["endpoint"]
+)
+SPI_BYTES = REGISTRY.counter(
+    "epd_spi_bytes_total", "Image data bytes sent to the panel over SPI"
+)
+REFRESHES = REGISTRY.counter(
+    "epd_refreshes_total", "Panel refreshes by refresh mode", ["mode"]
+)
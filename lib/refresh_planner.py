@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Cost-model-driven choice of refresh mode for display updates
+"""
+
+import logging
+from typing import Iterable, List, NamedTuple, Optional
+
+from geometry import Rect, align_rect, bounding_box, coalesce_windows
+from timing_model import TimingModel
+from waveshare_epd.epd7in5b_V2 import (
+    EPD_HEIGHT,
+    EPD_WIDTH,
+    INIT_SEQUENCES,
+    POWER_ON,
+)
+
+logger = logging.getLogger(__name__)
+
+# Partial refreshes leave ghosting behind; after this many since the last
+# clean (fast or full) refresh only a clean refresh is considered correct
+DEFAULT_MAX_PARTIALS = 50
+# How far past a ghosting budget the hard limit is set, leaving room for the
+# idle-time clean refresh to run first
+DEFAULT_MAX_PARTIALS_MARGIN = 20
+
+# Bytes sent around each partial window: 0x91, 0x90 + 9 bytes, 0x13, 0x12
+PARTIAL_COMMAND_BYTES = 13
+# Bytes sent around a full frame: 0x10, 0x13, 0x12
+FULL_COMMAND_BYTES = 3
+
+
+class RefreshPlan(NamedTuple):
+    """A way of flushing an update and what it is predicted to cost"""
+
+    # "partial", "fast" or "full"; None when nothing needs refreshing
+    mode: Optional[str]
+    # Windows refreshed one partial refresh each; the whole screen otherwise
+    windows: List[Rect]
+    predicted_ms: float
+    reason: str
+
+    @property
+    def refreshes(self) -> int:
+        if self.mode is None:
+            return 0
+        return len(self.windows) if self.mode == "partial" else 1
+
+
+class RefreshPlanner:
+    """
+    Picks the cheapest correct refresh plan for a set of dirty rectangles
+
+    Candidates are one partial window around everything, a few partial
+    windows (see coalesce_windows), and a fast or normal full refresh. Each
+    is priced with the TimingModel, including the mode switch from the
+    panel's current mode and the SPI bytes sent. Partial plans are ruled
+    out once max_partials partial refreshes have accumulated since the last
+    clean refresh.
+    """
+
+    def __init__(
+        self,
+        timing: Optional[TimingModel] = None,
+        width: int = EPD_WIDTH,
+        height: int = EPD_HEIGHT,
+        max_partials: int = DEFAULT_MAX_PARTIALS,
+    ):
+        self.timing = timing or TimingModel.from_env()
+        self.width = width
+        self.height = height
+        self.max_partials = max_partials
+
+    def switch_ms(self, current: Optional[str], target: str) -> float:
+        """
+        Predicted time to put the panel into the target mode
+
+        Every switch resets the controller (see EPD.ensure_mode), so it
+        pays the reset and power-on plus the target's init sequence.
+        """
+        if current == target:
+            return 0.0
+        init_bytes = sum(
+            1 if register is POWER_ON else len(register)
+            for register in INIT_SEQUENCES[target]
+        )
+        return (
+            self.timing.reset_ms
+            + self.timing.power_on_ms
+            + self.timing.transfer_ms(init_bytes)
+        )
+
+    def partial_plan(
+        self,
+        windows: List[Rect],
+        current_mode: Optional[str],
+        first_partial: bool = False,
+        reason: str = "",
+    ) -> RefreshPlan:
+        """Plan one partial refresh per window"""
+        total = self.switch_ms(current_mode, "partial")
+        for i, window in enumerate(windows):
+            byte_count = PARTIAL_COMMAND_BYTES + window.byte_count
+            if first_partial and i == 0:
+                # The first partial refresh also fills the old-data plane
+                byte_count += window.byte_count
+            total += self.timing.transfer_ms(byte_count)
+            total += self.timing.refresh_ms("partial")
+        return RefreshPlan("partial", windows, total, reason)
+
+    def full_plan(
+        self, mode: str, current_mode: Optional[str], reason: str = ""
+    ) -> RefreshPlan:
+        """Plan a full-screen refresh in "fast" or "full" mode"""
+        screen = Rect(0, 0, self.width, self.height)
+        total = (
+            self.switch_ms(current_mode, mode)
+            + self.timing.transfer_ms(FULL_COMMAND_BYTES + 2 * screen.byte_count)
+            + self.timing.refresh_ms(mode)
+        )
+        return RefreshPlan(mode, [screen], total, reason)
+
+    def candidates(
+        self,
+        dirty: Iterable[Rect],
+        current_mode: Optional[str],
+        partials_since_clean: int = 0,
+        first_partial: bool = False,
+    ) -> List[RefreshPlan]:
+        """
+        Every plan considered for the dirty rectangles, cheapest first
+
+        Plans that are not correct (too many partial refreshes since the
+        last clean refresh) are left out.
+        """
+        dirty = [rect for rect in dirty if not rect.is_empty()]
+        if not dirty:
+            return [RefreshPlan(None, [], 0.0, "nothing changed")]
+
+        plans = [
+            self.full_plan("fast", current_mode, "fast full refresh"),
+            self.full_plan("full", current_mode, "full refresh"),
+        ]
+
+        refresh_cost = self.timing.refresh_ms("partial")
+        byte_cost = self.timing.transfer_ms(1)
+        single = [align_rect(bounding_box(dirty))]
+        windows = coalesce_windows(dirty, refresh_cost, byte_cost)
+        partial_options = [(single, "one partial window")]
+        if windows != single:
+            partial_options.append((windows, f"{len(windows)} partial windows"))
+        for option, reason in partial_options:
+            if partials_since_clean + len(option) <= self.max_partials:
+                plans.append(
+                    self.partial_plan(option, current_mode, first_partial, reason)
+                )
+
+        return sorted(plans, key=lambda plan: plan.predicted_ms)
+
+    def plan(
+        self,
+        dirty: Iterable[Rect],
+        current_mode: Optional[str],
+        partials_since_clean: int = 0,
+        first_partial: bool = False,
+    ) -> RefreshPlan:
+        """
+        Cheapest correct plan for flushing the dirty rectangles
+
+        Args:
+            dirty: Changed rectangles in display coordinates
+            current_mode: Refresh mode the panel is in, or None if it is off
+            partials_since_clean: Partial refreshes since the last clean one
+            first_partial: The next partial refresh must also write the
+                old-data plane (EPD partFlag)
+
+        Returns:
+            The RefreshPlan with the lowest predicted latency
+        """
+        plans = self.candidates(
+            dirty, current_mode, partials_since_clean, first_partial
+        )
+        best = plans[0]
+        logger.debug(
+            "Refresh plans: "
+            + ", ".join(f"{plan.reason} {plan.predicted_ms:.0f} ms" for plan in plans)
+        )
+        return best
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Hardware-free e-paper display backend with a timing model
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from PIL import Image
+
+from display_interface import DisplayInterface
+from framebuffer import FrameBuffer, PackedBitmap
+from geometry import Rect, align_rect, clip_rect
+from timing_model import TimingModel
+from waveshare_epd.epd7in5b_V2 import (
+    _INVERT,
+    BLANK_PLANE,
+    EPD_HEIGHT,
+    EPD_WIDTH,
+    to_1bpp,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationDisplay(DisplayInterface):
+    """
+    Simulated 7.5" e-paper display
+
+    Keeps the panel's black/white RAM in memory and charges every reset,
+    SPI transfer and refresh against a TimingModel. With time_scale=1.0 the
+    calls block for the modelled duration like the real panel; 0 makes them
+    return immediately while still accounting the simulated time.
+    """
+
+    def __init__(
+        self, timing: Optional[TimingModel] = None, time_scale: Optional[float] = None
+    ):
+        self.width = EPD_WIDTH
+        self.height = EPD_HEIGHT
+        self.partFlag = 1
+        self.timing = timing or TimingModel.from_env()
+        if time_scale is None:
+            time_scale = float(os.environ.get("EPD_SIM_TIME_SCALE", "1.0"))
+        self.time_scale = time_scale
+
+        # Panel RAM holding the visible black/white image
+        self.panel = FrameBuffer(self.width, self.height)
+        self.mode = None
+        # Partial window the controller is in after display_Partial (0x91),
+        # until the next reset
+        self.window: Optional[Rect] = None
+
+        # Accounting
+        self.elapsed_ms = 0.0
+        self.busy_ms = 0.0
+        self.spi_bytes = 0
+        self.resets = 0
+        self.refreshes = {"full": 0, "fast": 0, "partial": 0}
+
+    def _spend(self, ms: float, busy: bool = False):
+        self.elapsed_ms += ms
+        if busy:
+            self.busy_ms += ms
+        if self.time_scale > 0:
+            time.sleep(ms * self.time_scale / 1000.0)
+
+    def _send(self, byte_count: int):
+        self.spi_bytes += byte_count
+        self._spend(self.timing.transfer_ms(byte_count))
+
+    def _power_on(self, mode: str) -> int:
+        self.resets += 1
+        self._spend(self.timing.reset_ms)
+        self._spend(self.timing.power_on_ms, busy=True)
+        self.mode = mode
+        self.window = None
+        self.partFlag = 1
+        logger.debug(f"Simulated e-Paper initialized for {mode} mode")
+        return 0
+
+    def _refresh(self):
+        mode = self.mode or "full"
+        self.refreshes[mode] += 1
+        self._spend(self.timing.refresh_ms(mode), busy=True)
+
+    def init(self):
+        return self._power_on("full")
+
+    def init_Fast(self):
+        return self._power_on("fast")
+
+    def init_part(self):
+        return self._power_on("partial")
+
+    def ensure_mode(self, mode):
+        if mode == self.mode:
+            return 0
+        return self._power_on(mode)
+
+    def getbuffer(self, image):
+        img = to_1bpp(image, self.width, self.height)
+        if img is None:
+            # return a blank buffer
+            return BLANK_PLANE
+
+        # Same polarity as EPD.getbuffer: 1 = black
+        return img.tobytes("raw").translate(_INVERT)
+
+    def display(self, imageblack, imagered):
+        # display() receives getbuffer() output and sends it inverted back
+        self._display_planes(bytes(imageblack).translate(_INVERT), imagered)
+
+    def display_image(self, image):
+        img = to_1bpp(image, self.width, self.height)
+        if img is None:
+            return
+        self._display_planes(img.tobytes("raw"), BLANK_PLANE)
+
+    def _display_planes(self, black, red):
+        self._send(len(black) + len(red))
+        if self.window is None:
+            self.panel.paste_packed(PackedBitmap(black, self.width, self.height), 0, 0)
+        else:
+            # Still in the partial window: only the start of the 0x13 plane
+            # lands, inside the window
+            window = self.window
+            self.panel.paste_packed(
+                PackedBitmap(
+                    bytes(red[: window.byte_count]), window.width, window.height
+                ),
+                window.x0,
+                window.y0,
+            )
+        self._refresh()
+
+    def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
+        window = clip_rect(
+            align_rect(Rect(Xstart, Ystart, Xend, Yend)), self.width, self.height
+        )
+        # Command, window setting and the 0x13 command
+        self._send(11)
+
+        if self.partFlag == 1:
+            self.partFlag = 0
+            self._send(window.byte_count)
+
+        self._send(len(Image))
+        self.panel.paste_packed(
+            PackedBitmap(bytes(Image), window.width, window.height),
+            window.x0,
+            window.y0,
+        )
+        self.window = window
+        self._refresh()
+
+    def Clear(self):
+        logger.info("Clearing simulated display")
+        size = self.width // 8 * self.height
+        self._display_planes(b"\xff" * size, BLANK_PLANE)
+
+    def sleep(self):
+        self._spend(self.timing.sleep_ms)
+        self.mode = None
+
+    def to_image(self) -> Image.Image:
+        """Current visible panel contents"""
+        return self.panel.to_image()
+
+    def stats(self):
+        return {
+            "elapsed_ms": self.elapsed_ms,
+            "busy_ms": self.busy_ms,
+            "spi_bytes": self.spi_bytes,
+            "resets": self.resets,
+            "refreshes": dict(self.refreshes),
+        }
+
+
+class SimulatedBackend:
+    """
+    epdconfig-style backend that decodes the driver's SPI stream
+
+    Interprets the commands EPD sends (window, RAM writes, refresh, mode
+    registers) and applies them to a SimulationDisplay, charging SPI bytes,
+    delays and refreshes against its timing model. Used to replay traces
+    recorded on hardware through the simulator.
+    """
+
+    # Pin definition, as in epdconfig
+    RST_PIN = 17
+    DC_PIN = 25
+    CS_PIN = 8
+    BUSY_PIN = 24
+    PWR_PIN = 18
+
+    # 0xE5 (cascade temperature) value selected by each init sequence
+    MODES = {0x5A: "fast", 0x6E: "partial"}
+
+    def __init__(self, display: Optional[SimulationDisplay] = None):
+        self.display = display or SimulationDisplay(time_scale=0)
+        self.dc = 1
+        self.command = None
+        self.data = bytearray()
+        self.window = None
+        # Whether the controller is in its partial window (0x91 until 0x92)
+        self.partial = False
+        # Black/white image RAM written since the last refresh
+        self.pending = None
+
+    def digital_write(self, pin, value):
+        if pin == self.DC_PIN:
+            self.dc = value
+        elif pin == self.RST_PIN and value == 0:
+            self._finish_command()
+            self.command = None
+            self.window = None
+            self.partial = False
+            self.display.resets += 1
+            self.display.mode = "full"
+
+    def digital_read(self, pin):
+        # Refreshes are charged synchronously, so the panel is always idle
+        return 1 if pin == self.BUSY_PIN else 0
+
+    def digital_wait(self, pin, value, timeout_ms=None):
+        return True
+
+    def delay_ms(self, delaytime):
+        self.display._spend(delaytime)
+
+    def spi_writebyte(self, data):
+        self._write(bytes(data))
+
+    def spi_writebyte2(self, data):
+        self._write(bytes(data))
+
+    def module_init(self, cleanup=False):
+        return 0
+
+    def module_exit(self, cleanup=False):
+        self.display.mode = None
+
+    def _write(self, data):
+        self.display._send(len(data))
+        if self.dc:
+            if self.command is not None:
+                self.data += data
+            return
+        for command in data:
+            self._finish_command()
+            self.command = command
+            self.data = bytearray()
+            if command == 0x91:
+                self.partial = True
+            elif command == 0x92:
+                self.partial = False
+            elif command == 0x12:
+                self._refresh()
+            elif command == 0x04:
+                self.display._spend(self.display.timing.power_on_ms, busy=True)
+
+    def _finish_command(self):
+        command, data = self.command, self.data
+        if command == 0xE5 and data:
+            self.display.mode = self.MODES.get(data[0], "full")
+        elif command == 0x90 and len(data) >= 8:
+            x0 = data[0] << 8 | data[1]
+            x1 = (data[2] << 8 | data[3]) + 1
+            y0 = data[4] << 8 | data[5]
+            y1 = (data[6] << 8 | data[7]) + 1
+            self.window = clip_rect(
+                align_rect(Rect(x0, y0, x1, y1)),
+                self.display.width,
+                self.display.height,
+            )
+        elif command == 0x10 and not self.partial:
+            # Full updates take the black/white image from the 0x10 plane
+            self.pending = (Rect(0, 0, self.display.width, self.display.height), data)
+        elif command == 0x13 and self.partial and self.window is not None:
+            # Partial updates take it from 0x13; RAM writes stop at the end
+            # of the window, even for a full frame
+            self.pending = (self.window, data[: self.window.byte_count])
+
+    def _refresh(self):
+        self._finish_command()
+        if self.pending is not None:
+            rect, data = self.pending
+            if len(data) == rect.byte_count:
+                self.display.panel.paste_packed(
+                    PackedBitmap(bytes(data), rect.width, rect.height),
+                    rect.x0,
+                    rect.y0,
+                )
+            self.pending = None
+        self.display._refresh()
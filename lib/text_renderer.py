@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Glyph atlas text rendering straight into a packed 1bpp FrameBuffer
+"""
+
+import logging
+import os
+import string
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from framebuffer import FrameBuffer
+from geometry import Rect, clip_rect
+
+logger = logging.getLogger(__name__)
+
+FONT_PATHS = [
+    "/System/Library/Fonts/Arial.ttf",  # macOS
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Linux
+    "/usr/share/fonts/TTF/Arial.ttf",  # Some Linux distros
+]
+
+# Characters rasterized up front; anything else is added on first use
+DEFAULT_CHARSET = string.digits + string.ascii_letters + string.punctuation + " "
+
+
+def load_font(size: int, paths=FONT_PATHS):
+    """First available TrueType font from paths, or PIL's default font"""
+    try:
+        for font_path in paths:
+            if os.path.exists(font_path):
+                return ImageFont.truetype(font_path, size)
+        logger.warning("Using default font - text may not display optimally")
+    except Exception as e:
+        logger.warning(f"Could not load system font: {e}")
+    return ImageFont.load_default()
+
+
+class Glyph(NamedTuple):
+    """A character's ink and metrics, relative to its pen position"""
+
+    # Ink box offset from the pen position (draw.text's anchor "la")
+    x: int
+    y: int
+    width: int
+    height: int
+    advance: float
+    # Packed rows of the ink for each bit phase (x % 8) of the destination:
+    # ink bits are 0 and every other bit 1, so drawing is a single AND
+    phases: Tuple[np.ndarray, ...]
+
+
+def _rasterize(font, char: str) -> Glyph:
+    x0, y0, x1, y1 = font.getbbox(char)
+    advance = font.getlength(char)
+    if x1 <= x0 or y1 <= y0:
+        return Glyph(x0, y0, 0, 0, advance, ())
+
+    image = Image.new("1", (x1 - x0, y1 - y0), 255)
+    ImageDraw.Draw(image).text((-x0, -y0), char, fill=0, font=font)
+    white = np.asarray(image, dtype=bool)
+    height, width = white.shape
+
+    phases = []
+    for shift in range(8):
+        padded = np.ones((height, (shift + width + 7) // 8 * 8), dtype=bool)
+        padded[:, shift : shift + width] = white
+        phases.append(np.packbits(padded, axis=1))
+    return Glyph(x0, y0, width, height, advance, tuple(phases))
+
+
+class TextRenderer:
+    """
+    Draws text in one font by ANDing pre-rasterized glyphs into a FrameBuffer
+
+    Every glyph is rendered once with PIL, at all eight bit offsets, so
+    drawing a string allocates no images and touches only the bytes under
+    its ink. Positions follow ImageDraw.text: (x, y) is the top-left of the
+    line, and bbox() matches ImageDraw.textbbox for the same origin.
+    """
+
+    def __init__(self, font, charset: str = DEFAULT_CHARSET):
+        self.font = font
+        self.glyphs: Dict[str, Glyph] = {}
+        self.kerning: Dict[str, float] = {}
+        for char in charset:
+            self.glyph(char)
+        # Height of the line box, from its top to the bottom of the descent;
+        # the baseline is always ascent pixels below the top
+        try:
+            ascent, descent = font.getmetrics()
+        except AttributeError:
+            # Bitmap fonts have no metrics; use the ink of the charset
+            ascent, descent = self.bbox(charset)[3], 0
+        self.ascent = ascent
+        self.line_height = ascent + descent
+
+    def glyph(self, char: str) -> Glyph:
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.glyphs[char] = _rasterize(self.font, char)
+        return glyph
+
+    def _kern(self, pair: str) -> float:
+        kern = self.kerning.get(pair)
+        if kern is None:
+            kern = self.kerning[pair] = (
+                self.font.getlength(pair)
+                - self.glyph(pair[0]).advance
+                - self.glyph(pair[1]).advance
+            )
+        return kern
+
+    def layout(self, text: str) -> List[Tuple[int, Glyph]]:
+        """Pen x offset and glyph of each character"""
+        placed = []
+        pen = 0.0
+        previous = None
+        for char in text:
+            if previous is not None:
+                pen += self._kern(previous + char)
+            glyph = self.glyph(char)
+            placed.append((round(pen), glyph))
+            pen += glyph.advance
+            previous = char
+        return placed
+
+    def bbox(self, text: str) -> Tuple[int, int, int, int]:
+        """Ink bounding box (x0, y0, x1, y1) of text drawn at (0, 0)"""
+        boxes = [
+            (pen + g.x, g.y, pen + g.x + g.width, g.y + g.height)
+            for pen, g in self.layout(text)
+            if g.width
+        ]
+        if not boxes:
+            return (0, 0, 0, 0)
+        x0, y0, x1, y1 = zip(*boxes)
+        return (min(x0), min(y0), max(x1), max(y1))
+
+    def glyph_boxes(self, text: str, x: int, y: int) -> List[Tuple[str, Rect]]:
+        """Character and screen ink box of each inked glyph of text at (x, y)"""
+        return [
+            (
+                char,
+                Rect(
+                    x + pen + glyph.x,
+                    y + glyph.y,
+                    x + pen + glyph.x + glyph.width,
+                    y + glyph.y + glyph.height,
+                ),
+            )
+            for char, (pen, glyph) in zip(text, self.layout(text))
+            if glyph.width
+        ]
+
+    def draw(
+        self,
+        fb: FrameBuffer,
+        text: str,
+        x: int,
+        y: int,
+        clip: Optional[Rect] = None,
+    ):
+        """
+        Draw black text into the framebuffer with its line top-left at (x, y)
+
+        Only ink is written; clear the area first (FrameBuffer.fill_rect) to
+        replace earlier text. Glyphs are clipped to the framebuffer, and to
+        clip if given, to the pixel.
+        """
+        clip = clip_rect(clip or fb.bounds, fb.width, fb.height)
+        for pen, glyph in self.layout(text):
+            if glyph.width:
+                _and_glyph(fb.data, glyph, x + pen + glyph.x, y + glyph.y, clip)
+
+
+def _and_glyph(dst: np.ndarray, glyph: Glyph, x: int, y: int, clip: Rect):
+    src = glyph.phases[x % 8]
+    bx = x // 8
+    cx0, cx1 = clip.x0 // 8, (clip.x1 + 7) // 8
+    sy0, sx0 = max(0, clip.y0 - y), max(0, cx0 - bx)
+    sy1 = min(src.shape[0], clip.y1 - y)
+    sx1 = min(src.shape[1], cx1 - bx)
+    if sy1 <= sy0 or sx1 <= sx0:
+        return
+    ink = src[sy0:sy1, sx0:sx1]
+    if clip.x0 % 8 or clip.x1 % 8:
+        # Drop the ink outside the clip in its first and last bytes
+        start = (bx + sx0) * 8
+        inside = np.zeros((sx1 - sx0) * 8, dtype=bool)
+        inside[max(0, clip.x0 - start) : max(0, clip.x1 - start)] = True
+        ink = ink | ~np.packbits(inside)
+    dst[y + sy0 : y + sy1, bx + sx0 : bx + sx1] &= ink
+
+
+def changed_glyphs(previous, current) -> List[Rect]:
+    """
+    Ink boxes of glyphs drawn in only one of two glyph_boxes() results
+
+    Going from "Counter 41" to "Counter 42" gives the boxes of the old "1"
+    and the new "2"; every pixel outside them is unchanged, as long as the
+    text area is cleared and redrawn as a whole.
+    """
+    return [rect for _, rect in set(previous) ^ set(current)]
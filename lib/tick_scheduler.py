@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Fixed-rate display updates on absolute deadlines, skipping late frames
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TickScheduler:
+    """
+    Shows tick n as soon as possible after start + n * period
+
+    render(tick, previous) builds the frame for a tick from the frame last
+    handed to show (None for the first tick); it runs on the event loop and
+    must not block. show(frame) drives the panel in a worker thread, and the
+    next tick is rendered while it runs, so rendering is off the critical
+    path. Deadlines never drift: when a refresh overruns, the ticks whose
+    deadlines have passed are skipped and the newest one is shown instead of
+    queueing stale frames.
+    """
+
+    def __init__(
+        self,
+        period: float,
+        render: Callable[[int, Any], Any],
+        show: Callable[[Any], None],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.render = render
+        self.show = show
+        self.clock = clock
+        self.start = None
+        self.shown = 0
+        self.skipped = 0
+        self.late_max = 0.0
+        self.late_total = 0.0
+
+    async def run(self, duration: Optional[float] = None):
+        """Tick until cancelled, or until duration seconds after the start"""
+        self.start = self.clock()
+        tick = 0
+        previous = None
+        frame = self.render(tick, previous)
+
+        while True:
+            deadline = self.start + tick * self.period
+            delay = deadline - self.clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if duration is not None and deadline - self.start >= duration:
+                break
+
+            late = max(0.0, self.clock() - deadline)
+            self.late_max = max(self.late_max, late)
+            self.late_total += late
+
+            showing = asyncio.create_task(asyncio.to_thread(self.show, frame))
+            previous = frame
+            next_tick = tick + 1
+            # Prepared while the panel refreshes; replaced below if the
+            # refresh overruns past the next deadline
+            next_frame = self.render(next_tick, previous)
+            await showing
+            self.shown += 1
+
+            due = int((self.clock() - self.start) // self.period)
+            if due > next_tick:
+                logger.debug(f"Refresh overran, skipping ticks {next_tick}-{due - 1}")
+                self.skipped += due - next_tick
+                next_tick = due
+                next_frame = self.render(next_tick, previous)
+            tick, frame = next_tick, next_frame
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = self.clock() - self.start if self.start is not None else 0.0
+        return {
+            "target_fps": 1.0 / self.period,
+            "achieved_fps": self.shown / elapsed if elapsed > 0 else 0.0,
+            "shown": self.shown,
+            "skipped": self.skipped,
+            "late_ms_max": self.late_max * 1000.0,
+            "late_ms_mean": (
+                self.late_total / self.shown * 1000.0 if self.shown else 0.0
+            ),
+        }
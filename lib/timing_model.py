@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Timing constants for the 7.5" e-paper panel refresh modes
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class TimingModel:
+    """
+    Per-mode refresh and transfer timings, in milliseconds
+
+    The defaults are estimates for the epd7in5b_V2 controller driven the way
+    epd7in5b_V2.EPD drives it. Measured values can be loaded from a JSON
+    file with the same keys, e.g. the one named by EPD_TIMING_FILE.
+    """
+
+    DEFAULTS: Dict[str, float] = {
+        # reset() holds RST for 200 + 4 + 200 ms
+        "reset_ms": 404.0,
+        # Power on (0x04) plus the fixed 100 ms delay before ReadBusy
+        "power_on_ms": 180.0,
+        # Panel busy time after 0x12 for each refresh mode
+        "full_refresh_ms": 16000.0,
+        "fast_refresh_ms": 2500.0,
+        "partial_refresh_ms": 800.0,
+        # Fixed delays around each refresh (delay_ms(100) + ReadBusy settle)
+        "refresh_overhead_ms": 300.0,
+        # Power off (0x02) and the 2 s deep sleep delay
+        "sleep_ms": 2100.0,
+        "spi_hz": 4000000.0,
+    }
+
+    def __init__(self, **overrides: float):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown timing constants: {', '.join(sorted(unknown))}")
+        self.values = {**self.DEFAULTS, **overrides}
+
+    def __getattr__(self, name: str) -> float:
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @classmethod
+    def from_file(cls, path: str) -> "TimingModel":
+        """Load measured constants from a JSON file"""
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    @classmethod
+    def from_env(cls) -> "TimingModel":
+        """Load constants from EPD_TIMING_FILE if set, otherwise use defaults"""
+        path = os.environ.get("EPD_TIMING_FILE")
+        if path:
+            logger.info(f"Loading e-paper timing model from {path}")
+            return cls.from_file(path)
+        return cls()
+
+    def refresh_ms(self, mode: str) -> float:
+        """Total time of one refresh in the given mode ("full", "fast", "partial")"""
+        return self.values[f"{mode}_refresh_ms"] + self.refresh_overhead_ms
+
+    def transfer_ms(self, byte_count: int) -> float:
+        """Time to clock byte_count bytes over SPI"""
+        return byte_count * 8 * 1000.0 / self.spi_hz
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.values)
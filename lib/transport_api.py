@@ -327,6 +327,9 @@ class TransportNSWAPI:
                 "is_realtime": event.get("transportation", {}).get(
                     "isRealtimeControlled", False
                 ),
+                "trip_id": event.get("properties", {}).get("RealtimeTripId", ""),
+                "departure_time": event.get("departureTimeEstimated")
+                or event.get("departureTimePlanned", ""),
             }
             summary.append(departure)
 
@@ -470,6 +473,9 @@ class TransportNSWAPI:
                 .get("product", {})
                 .get("name", ""),
                 "is_realtime": event.get("isRealtimeControlled", False),
+                "trip_id": event.get("properties", {}).get("RealtimeTripId", ""),
+                "departure_time": event.get("departureTimeEstimated")
+                or event.get("departureTimePlanned", ""),
                 "platform": event.get("location", {})
                 .get("properties", {})
                 .get("platform", ""),
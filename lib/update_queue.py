@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Coalescing single-consumer update queue in front of the e-paper panel
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+import metrics
+from framebuffer import FrameBuffer
+from geometry import Rect
+
+logger = logging.getLogger(__name__)
+
+
+class PendingUpdate:
+    """A submitted update waiting for the panel"""
+
+    def __init__(
+        self,
+        regions: Optional[List[Tuple[Any, int, int]]] = None,
+        full_image: Optional[Image.Image] = None,
+        on_start: Optional[Callable[[float], None]] = None,
+    ):
+        self.regions = regions or []
+        self.full_image = full_image
+        self.on_start = on_start
+        self.submitted_at = time.time()
+        self.rects = [
+            Rect(x, y, x + image.width, y + image.height)
+            for image, x, y in self.regions
+        ]
+        self.future = asyncio.get_running_loop().create_future()
+
+    @property
+    def is_full(self) -> bool:
+        return self.full_image is not None
+
+    def is_superseded_by(self, later: List["PendingUpdate"]) -> bool:
+        """True if every pixel of this update is overwritten by a later one"""
+        if any(update.is_full for update in later):
+            return True
+        if self.is_full:
+            return False
+        later_rects = [rect for update in later for rect in update.rects]
+        return all(
+            any(other.contains(rect) for other in later_rects) for rect in self.rects
+        )
+
+
+class UpdateQueue:
+    """
+    Serializes all panel access through one consumer task.
+
+    Updates submitted while the panel is busy are merged into the next
+    flush: regions are composited in submission order so the newest content
+    wins for every pixel, and updates that are completely overwritten by a
+    later one are dropped without ever reaching the panel.
+
+    When the driver reports that a clean refresh is due, it is run once the
+    queue has been idle for clean_idle_seconds, so it does not delay an
+    interactive update.
+    """
+
+    def __init__(self, driver, clean_idle_seconds: float = 5.0):
+        self.driver = driver
+        self.clean_idle_seconds = clean_idle_seconds
+        self.pending: List[PendingUpdate] = []
+        self.busy = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters exposed through stats()
+        self.submitted = 0
+        self.flushes = 0
+        self.merged = 0
+        self.dropped = 0
+        self.clean_refreshes = 0
+
+    def start(self):
+        """Start the consumer task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush pending updates and stop the consumer task"""
+        if self._task is None:
+            return
+        while self.pending or self.busy:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def submit_regions(
+        self,
+        regions: List[Tuple[Any, int, int]],
+        on_start: Optional[Callable[[float], None]] = None,
+    ):
+        """
+        Queue region updates; returns a future resolved after the flush
+
+        Args:
+            regions: List of (image, x, y) tuples, where image is a prepared
+                PIL image or a PackedBitmap
+            on_start: Called with the start timestamp when the flush that
+                contains these regions begins
+        """
+        return self._submit(PendingUpdate(regions=regions, on_start=on_start))
+
+    def submit_full(
+        self, image: Image.Image, on_start: Optional[Callable[[float], None]] = None
+    ):
+        """Queue a full image update; returns a future resolved after the flush"""
+        return self._submit(PendingUpdate(full_image=image, on_start=on_start))
+
+    def _submit(self, update: PendingUpdate):
+        self.pending.append(update)
+        self.submitted += 1
+        self._wakeup.set()
+        return update.future
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and coalescing counters"""
+        return {
+            "depth": len(self.pending),
+            "busy": self.busy,
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "clean_refreshes": self.clean_refreshes,
+        }
+
+    async def _run(self):
+        while True:
+            if self.driver.needs_clean_refresh():
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.clean_idle_seconds)
+                except asyncio.TimeoutError:
+                    await self._clean_refresh()
+                    continue
+            else:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.pending:
+                continue
+
+            batch, self.pending = self.pending, []
+            self.busy = True
+            try:
+                await self._flush(batch)
+            finally:
+                self.busy = False
+
+    async def _clean_refresh(self):
+        self.busy = True
+        try:
+            await asyncio.to_thread(self.driver.clean_refresh)
+            self.clean_refreshes += 1
+        except Exception as e:
+            logger.error(f"Error running clean refresh: {e}")
+        finally:
+            self.busy = False
+
+    async def _flush(self, batch: List[PendingUpdate]):
+        live = []
+        for i, update in enumerate(batch):
+            if update.is_superseded_by(batch[i + 1 :]):
+                self.dropped += 1
+            else:
+                live.append(update)
+
+        self.flushes += 1
+        self.merged += len(live) - 1
+        logger.info(
+            f"Flushing {len(live)} updates ({len(batch) - len(live)} superseded)"
+        )
+
+        started_at = time.time()
+        for update in batch:
+            metrics.QUEUE_WAIT_SECONDS.observe(started_at - update.submitted_at)
+            if update.on_start is not None:
+                update.on_start(started_at)
+
+        try:
+            full_updates = [update for update in live if update.is_full]
+            if full_updates:
+                # Everything before the last full frame was dropped above, so
+                # later regions are painted on top of it before one refresh
+                full_image = full_updates[-1].full_image
+                frame = FrameBuffer(full_image.width, full_image.height)
+                frame.paste(full_image, 0, 0)
+                for update in live[live.index(full_updates[-1]) + 1 :]:
+                    for region_image, x, y in update.regions:
+                        frame.paste(region_image, x, y)
+                plan = await asyncio.to_thread(
+                    self.driver.update_full, frame.to_image()
+                )
+            else:
+                regions = [region for update in live for region in update.regions]
+                plan = await asyncio.to_thread(self.driver.update_regions, regions)
+            result = {
+                "refreshes": plan.refreshes,
+                "full": plan.mode not in (None, "partial"),
+                "plan": plan.reason,
+                "predicted_ms": plan.predicted_ms,
+            }
+        except Exception as e:
+            logger.error(f"Error flushing display updates: {e}")
+            for update in batch:
+                if not update.future.done():
+                    update.future.set_exception(e)
+            return
+
+        result["coalesced"] = len(batch)
+        result["started_at"] = started_at
+        result["finished_at"] = time.time()
+        for update in batch:
+            if not update.future.done():
+                update.future.set_result(result)
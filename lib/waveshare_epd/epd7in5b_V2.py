@@ -28,7 +28,10 @@
 #
 
 
+import asyncio
+import functools
 import logging
+import time
 from . import epdconfig
 
 # Display resolution
@@ -37,9 +40,131 @@ EPD_HEIGHT = 480
 
 logger = logging.getLogger(__name__)
 
+# Translation table that inverts every bit of a byte
+_INVERT = bytes(b ^ 0xFF for b in range(256))
+
+# Empty red plane, shared by every black/white update
+BLANK_PLANE = bytes(EPD_WIDTH // 8 * EPD_HEIGHT)
+
+# Refresh modes and the register writes each init sequence makes after a
+# reset, as (command, data...) tuples; POWER_ON marks where 0x04 is sent
+MODE_FULL = "full"
+MODE_FAST = "fast"
+MODE_PARTIAL = "partial"
+POWER_ON = None
+INIT_SEQUENCES = {
+    MODE_FULL: (
+        (0x01, 0x07, 0x07, 0x3F, 0x3F),
+        (0x06, 0x17, 0x17, 0x28, 0x17),
+        POWER_ON,
+        (0x00, 0x0F),
+        (0x61, 0x03, 0x20, 0x01, 0xE0),  # 800x480
+        (0x15, 0x00),
+        (0x50, 0x11, 0x07),
+        (0x60, 0x22),
+    ),
+    MODE_FAST: (
+        (0x00, 0x0F),
+        POWER_ON,
+        (0x06, 0x27, 0x27, 0x18, 0x17),
+        (0xE0, 0x02),
+        (0xE5, 0x5A),
+        (0x50, 0x11, 0x07),
+    ),
+    MODE_PARTIAL: (
+        (0x00, 0x1F),
+        POWER_ON,
+        (0xE0, 0x02),
+        (0xE5, 0x6E),
+        (0x50, 0xA9, 0x07),
+    ),
+}
+
+
+def byte_align(x0, x1):
+    """Widen a horizontal range [x0, x1) to whole bytes (multiples of 8 pixels)"""
+    return x0 // 8 * 8, (x1 + 7) // 8 * 8
+
+
+def to_1bpp(image, width=EPD_WIDTH, height=EPD_HEIGHT):
+    """Convert to a panel-sized mode "1" image; None if the size is wrong"""
+    imwidth, imheight = image.size
+    if imwidth == width and imheight == height:
+        return image if image.mode == "1" else image.convert("1")
+    elif imwidth == height and imheight == width:
+        # image has correct dimensions, but needs to be rotated
+        return image.rotate(90, expand=True).convert("1")
+    logger.warning("Wrong image dimensions: must be " + str(width) + "x" + str(height))
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def spi_chunk_size():
+    """Largest single spidev transfer (the spidev bufsiz module parameter)"""
+    try:
+        with open("/sys/module/spidev/parameters/bufsiz") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 4096
+
+
+class Transaction:
+    """
+    Batches command and data bytes into as few SPI transfers as possible
+
+    Consecutive data bytes, including constant fills, are merged and sent
+    with one DC/CS toggle, split only at the spidev buffer size.
+
+        epd.transaction().command(0xE0, 0x02).command(0xE5, 0x6E).send()
+    """
+
+    def __init__(self, epd):
+        self.epd = epd
+        # [is_data, bytearray] segments in send order
+        self.segments = []
+
+    def _append(self, is_data, data):
+        if self.segments and self.segments[-1][0] == is_data:
+            self.segments[-1][1] += data
+        else:
+            self.segments.append([is_data, bytearray(data)])
+
+    def command(self, command, *data):
+        """Queue a command byte, optionally followed by its data bytes"""
+        self._append(False, bytes([command]))
+        if data:
+            self._append(True, bytes(data))
+        return self
+
+    def data(self, data):
+        """Queue a bytes-like object of data"""
+        self._append(True, data)
+        return self
+
+    def fill(self, value, count):
+        """Queue count copies of a data byte"""
+        self._append(True, bytes([value & 0xFF]) * count)
+        return self
+
+    def send(self):
+        for is_data, data in self.segments:
+            self.epd.send_bulk(data, is_data)
+        self.segments = []
+
 
 class EPD:
-    def __init__(self):
+    # ReadBusy strategies: "edge" blocks on a GPIO edge event, "poll" re-reads
+    # the pin every busy_poll_ms
+    BUSY_EDGE = "edge"
+    BUSY_POLL = "poll"
+
+    def __init__(
+        self,
+        busy_mode=BUSY_EDGE,
+        busy_timeout_ms=30000,
+        busy_settle_ms=200,
+        busy_poll_ms=10,
+    ):
         self.reset_pin = epdconfig.RST_PIN
         self.dc_pin = epdconfig.DC_PIN
         self.busy_pin = epdconfig.BUSY_PIN
@@ -47,6 +172,14 @@ class EPD:
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
         self.partFlag = 1
+        # Total time spent waiting in ReadBusy, for latency metrics
+        self.busy_ms = 0.0
+        self.busy_mode = busy_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self.busy_settle_ms = busy_settle_ms
+        self.busy_poll_ms = busy_poll_ms
+        # Refresh mode the controller is powered in; None when off or asleep
+        self.mode = None
 
     # Hardware reset
     def reset(self):
@@ -70,194 +203,185 @@ class EPD:
         epdconfig.digital_write(self.cs_pin, 1)
 
     def send_data2(self, data):  # faster
-        epdconfig.digital_write(self.dc_pin, 1)
+        self.send_bulk(data)
+
+    def send_bulk(self, data, is_data=True):
+        """Send a buffer with a single DC/CS toggle, in spidev-sized chunks"""
+        epdconfig.digital_write(self.dc_pin, 1 if is_data else 0)
         epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
+        chunk = spi_chunk_size()
+        if len(data) <= chunk:
+            epdconfig.spi_writebyte2(data)
+        else:
+            view = memoryview(bytes(data) if isinstance(data, list) else data)
+            for start in range(0, len(view), chunk):
+                epdconfig.spi_writebyte2(view[start : start + chunk])
         epdconfig.digital_write(self.cs_pin, 1)
 
-    def ReadBusy(self):
-        logger.debug("e-Paper busy")
+    def transaction(self):
+        """Start a batched command/data sequence"""
+        return Transaction(self)
+
+    def _wait_busy(self, timeout_ms):
+        """Wait for BUSY to go high (idle); returns False on timeout"""
         self.send_command(0x71)
-        busy = epdconfig.digital_read(self.busy_pin)
-        while busy == 0:
+        if epdconfig.digital_read(self.busy_pin) != 0:
+            return True
+
+        if self.busy_mode == self.BUSY_EDGE and hasattr(epdconfig, "digital_wait"):
+            return epdconfig.digital_wait(self.busy_pin, 1, timeout_ms)
+
+        deadline = (
+            None if timeout_ms is None else time.monotonic() + timeout_ms / 1000.0
+        )
+        while epdconfig.digital_read(self.busy_pin) == 0:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            epdconfig.delay_ms(self.busy_poll_ms)
             self.send_command(0x71)
-            busy = epdconfig.digital_read(self.busy_pin)
-        epdconfig.delay_ms(200)
+        return True
+
+    def ReadBusy(self, timeout_ms=None):
+        logger.debug("e-Paper busy")
+        if timeout_ms is None:
+            timeout_ms = self.busy_timeout_ms
+        start = time.monotonic()
+        released = self._wait_busy(timeout_ms)
+        self.busy_ms += (time.monotonic() - start) * 1000.0
+        if not released:
+            raise TimeoutError(f"e-Paper still busy after {timeout_ms} ms")
+        epdconfig.delay_ms(self.busy_settle_ms)
         logger.debug("e-Paper busy release")
 
-    def init(self):
+    async def ReadBusyAsync(self, timeout_ms=None):
+        """Awaitable ReadBusy: the wait runs in a worker thread, the settle
+        time is an asyncio sleep, so the event loop stays free meanwhile"""
+        if timeout_ms is None:
+            timeout_ms = self.busy_timeout_ms
+        start = time.monotonic()
+        released = await asyncio.to_thread(self._wait_busy, timeout_ms)
+        self.busy_ms += (time.monotonic() - start) * 1000.0
+        if not released:
+            raise TimeoutError(f"e-Paper still busy after {timeout_ms} ms")
+        await asyncio.sleep(self.busy_settle_ms / 1000.0)
+
+    def _init_mode(self, mode):
+        """Reset the controller and run a mode's full init sequence"""
         if epdconfig.module_init() != 0:
+            self.mode = None
             return -1
 
         # EPD hardware init start
         self.reset()
+        # The reset loses the old-data RAM, so the next partial update has
+        # to write it again
+        self.partFlag = 1
 
-        self.send_command(0x01)
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x3F)
-        self.send_data(0x3F)
-
-        self.send_command(0x06)
-        self.send_data(0x17)
-        self.send_data(0x17)
-        self.send_data(0x28)
-        self.send_data(0x17)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0x00)
-        self.send_data(0x0F)
-
-        self.send_command(0x61)
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01)
-        self.send_data(0xE0)
-
-        self.send_command(0x15)
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x11)
-        self.send_data(0x07)
-
-        self.send_command(0x60)
-        self.send_data(0x22)
+        transaction = self.transaction()
+        for register in INIT_SEQUENCES[mode]:
+            if register is POWER_ON:
+                transaction.command(0x04).send()
+                epdconfig.delay_ms(100)
+                self.ReadBusy()
+            else:
+                transaction.command(*register)
+        transaction.send()
 
+        # EPD hardware init end
+        self.mode = mode
         return 0
 
-    def init_Fast(self):
-        if epdconfig.module_init() != 0:
-            return -1
-
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)
-        self.send_data(0x0F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0x06)
-        self.send_data(0x27)
-        self.send_data(0x27)
-        self.send_data(0x18)
-        self.send_data(0x17)
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x5A)
-
-        self.send_command(0x50)
-        self.send_data(0x11)
-        self.send_data(0x07)
+    def init(self):
+        return self._init_mode(MODE_FULL)
 
-        return 0
+    def init_Fast(self):
+        return self._init_mode(MODE_FAST)
 
     def init_part(self):
-        if epdconfig.module_init() != 0:
-            return -1
-        # EPD hardware init start
-        self.reset()
-
-        self.send_command(0x00)
-        self.send_data(0x1F)
-
-        self.send_command(0x04)
-        epdconfig.delay_ms(100)
-        self.ReadBusy()
-
-        self.send_command(0xE0)
-        self.send_data(0x02)
-        self.send_command(0xE5)
-        self.send_data(0x6E)
+        return self._init_mode(MODE_PARTIAL)
+
+    def ensure_mode(self, mode):
+        """
+        Put the panel in a refresh mode ("full", "fast" or "partial")
+
+        Does nothing if it is already in that mode, so back-to-back updates
+        in one mode never reset the controller; any other switch runs the
+        mode's full init sequence. Returns 0 on success.
+        """
+        if mode not in INIT_SEQUENCES:
+            raise ValueError(
+                f"Unknown refresh mode '{mode}', expected one of: {', '.join(INIT_SEQUENCES)}"
+            )
+        if mode == self.mode:
+            return 0
 
-        self.send_command(0x50)
-        self.send_data(0xA9)
-        self.send_data(0x07)
-
-        # EPD hardware init end
-        return 0
+        logger.debug(f"Switching e-Paper from {self.mode} to {mode} mode")
+        return self._init_mode(mode)
 
     def getbuffer(self, image):
-        img = image
-        imwidth, imheight = img.size
-        if imwidth == self.width and imheight == self.height:
-            img = img.convert("1")
-        elif imwidth == self.height and imheight == self.width:
-            # image has correct dimensions, but needs to be rotated
-            img = img.rotate(90, expand=True).convert("1")
-        else:
-            logger.warning(
-                "Wrong image dimensions: must be "
-                + str(self.width)
-                + "x"
-                + str(self.height)
-            )
+        img = to_1bpp(image, self.width, self.height)
+        if img is None:
             # return a blank buffer
-            return [0x00] * (int(self.width / 8) * self.height)
+            return BLANK_PLANE
 
-        buf = bytearray(img.tobytes("raw"))
         # The bytes need to be inverted, because in the PIL world 0=black and 1=white, but
         # in the e-paper world 0=white and 1=black.
-        for i in range(len(buf)):
-            buf[i] ^= 0xFF
-        return buf
+        return img.tobytes("raw").translate(_INVERT)
 
     def display(self, imageblack, imagered):
-        self.send_command(0x10)
+        if not isinstance(imageblack, (bytes, bytearray)):
+            imageblack = bytes(imageblack)
+        if isinstance(imagered, list):
+            imagered = bytes(imagered)
         # The black bytes need to be inverted back from what getbuffer did
-        for i in range(len(imageblack)):
-            imageblack[i] ^= 0xFF
-        self.send_data2(imageblack)
+        self.display_planes(imageblack.translate(_INVERT), imagered)
+
+    def display_planes(self, black, red=BLANK_PLANE):
+        """
+        Write both planes and run a refresh
+
+        black is in PIL mode "1" layout (1 = white), as returned by
+        Image.tobytes(); both planes are sent without being copied.
+        """
+        self.send_command(0x10)
+        self.send_bulk(memoryview(black))
 
         self.send_command(0x13)
-        self.send_data2(imagered)
+        self.send_bulk(memoryview(red))
 
         self.send_command(0x12)
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
+    def display_image(self, image):
+        """Display a black/white PIL image with a blank red plane"""
+        img = to_1bpp(image, self.width, self.height)
+        if img is None:
+            return
+        self.display_planes(img.tobytes("raw"))
+
     def display_Base_color(self, color):
         if self.width % 8 == 0:
             Width = self.width // 8
         else:
             Width = self.width // 8 + 1
         Height = self.height
-        self.send_command(0x10)  # Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(color)
-
-        self.send_command(0x13)  # Write Black and White image to RAM
-        for j in range(Height):
-            for i in range(Width):
-                self.send_data(~color)
-
-        self.send_command(0x12)
+        (
+            self.transaction()
+            .command(0x10)  # Write Black and White image to RAM
+            .fill(color, Width * Height)
+            .command(0x13)  # Write Black and White image to RAM
+            .fill(~color, Width * Height)
+            .command(0x12)
+            .send()
+        )
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
     def display_Partial(self, Image, Xstart, Ystart, Xend, Yend):
-        if (
-            (Xstart % 8 + Xend % 8 == 8 & Xstart % 8 > Xend % 8) | Xstart % 8 + Xend % 8
-            == 0 | (Xend - Xstart) % 8
-            == 0
-        ):
-            Xstart = Xstart // 8 * 8
-            Xend = Xend // 8 * 8
-        else:
-            Xstart = Xstart // 8 * 8
-            if Xend % 8 == 0:
-                Xend = Xend // 8 * 8
-            else:
-                Xend = Xend // 8 * 8 + 1
+        # The controller's window is whole bytes wide; Image must hold the
+        # packed rows of that aligned window (see byte_align)
+        Xstart, Xend = byte_align(Xstart, Xend)
 
         Width = (Xend - Xstart) // 8
         Height = Yend - Ystart
@@ -266,29 +390,28 @@ class EPD:
         # self.send_data(0xA9)
         # self.send_data(0x07)
 
-        self.send_command(0x91)  # This command makes the display enter partial mode
-        self.send_command(0x90)  # resolution setting
-        self.send_data(Xstart // 256)
-        self.send_data(Xstart % 256)  # x-start
-
-        self.send_data((Xend - 1) // 256)
-        self.send_data((Xend - 1) % 256)  # x-end
-
-        self.send_data(Ystart // 256)  #
-        self.send_data(Ystart % 256)  # y-start
-
-        self.send_data((Yend - 1) // 256)
-        self.send_data((Yend - 1) % 256)  # y-end
-        self.send_data(0x01)
+        transaction = (
+            self.transaction()
+            .command(0x91)  # This command makes the display enter partial mode
+            .command(
+                0x90,  # resolution setting
+                Xstart // 256,
+                Xstart % 256,  # x-start
+                (Xend - 1) // 256,
+                (Xend - 1) % 256,  # x-end
+                Ystart // 256,
+                Ystart % 256,  # y-start
+                (Yend - 1) // 256,
+                (Yend - 1) % 256,  # y-end
+                0x01,
+            )
+        )
 
         if self.partFlag == 1:
             self.partFlag = 0
-            self.send_command(0x10)
-            for j in range(Height):
-                for i in range(Width):
-                    self.send_data(0xFF)
+            transaction.command(0x10).fill(0xFF, Width * Height)
 
-        self.send_command(0x13)  # Write Black and White image to RAM
+        transaction.command(0x13).send()  # Write Black and White image to RAM
         self.send_data2(Image)
 
         self.send_command(0x12)
@@ -297,15 +420,16 @@ class EPD:
 
     def Clear(self):
         logger.info("Clearing display for real")
-        buf = [0x00] * (int(self.width / 8) * self.height)
-        buf2 = [0xFF] * (int(self.width / 8) * self.height)
-        self.send_command(0x10)
-        self.send_data2(buf2)
-
-        self.send_command(0x13)
-        self.send_data2(buf)
-
-        self.send_command(0x12)
+        size = int(self.width / 8) * self.height
+        (
+            self.transaction()
+            .command(0x10)
+            .fill(0xFF, size)
+            .command(0x13)
+            .fill(0x00, size)
+            .command(0x12)
+            .send()
+        )
         epdconfig.delay_ms(100)
         self.ReadBusy()
 
@@ -313,11 +437,11 @@ class EPD:
         self.send_command(0x02)  # POWER_OFF
         self.ReadBusy()
 
-        self.send_command(0x07)  # DEEP_SLEEP
-        self.send_data(0xA5)
+        self.transaction().command(0x07, 0xA5).send()  # DEEP_SLEEP
 
         epdconfig.delay_ms(2000)
         epdconfig.module_exit()
+        self.mode = None
 
 
 ### END OF FILE ###
@@ -27,11 +27,11 @@
 # THE SOFTWARE.
 #
 
+import functools
 import os
 import logging
 import sys
 import time
-import subprocess
 
 from ctypes import *
 
@@ -93,6 +93,16 @@ class RaspberryPi:
         elif pin == self.PWR_PIN:
             return self.PWR_PIN.value
 
+    def digital_wait(self, pin, value, timeout_ms=None):
+        """Block until pin reads value using GPIO edge events; False on timeout"""
+        if pin != self.BUSY_PIN:
+            raise ValueError("Only the BUSY pin supports waiting")
+        timeout = None if timeout_ms is None else timeout_ms / 1000.0
+        # BUSY is a pull-down Button, so "pressed" means the pin is high
+        if value:
+            return bool(self.GPIO_BUSY_PIN.wait_for_press(timeout))
+        return bool(self.GPIO_BUSY_PIN.wait_for_release(timeout))
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -196,6 +206,16 @@ class JetsonNano:
     def digital_read(self, pin):
         return self.GPIO.input(self.BUSY_PIN)
 
+    def digital_wait(self, pin, value, timeout_ms=None):
+        """Block until pin reads value using GPIO edge events; False on timeout"""
+        if self.GPIO.input(pin) == value:
+            return True
+        edge = self.GPIO.RISING if value else self.GPIO.FALLING
+        if timeout_ms is None:
+            self.GPIO.wait_for_edge(pin, edge)
+            return True
+        return self.GPIO.wait_for_edge(pin, edge, timeout=int(timeout_ms)) is not None
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -256,6 +276,16 @@ class SunriseX3:
     def digital_read(self, pin):
         return self.GPIO.input(pin)
 
+    def digital_wait(self, pin, value, timeout_ms=None):
+        """Block until pin reads value using GPIO edge events; False on timeout"""
+        if self.GPIO.input(pin) == value:
+            return True
+        edge = self.GPIO.RISING if value else self.GPIO.FALLING
+        if timeout_ms is None:
+            self.GPIO.wait_for_edge(pin, edge)
+            return True
+        return self.GPIO.wait_for_edge(pin, edge, timeout=int(timeout_ms)) is not None
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -303,29 +333,142 @@ class SunriseX3:
         )
 
 
-if sys.version_info[0] == 2:
-    process = subprocess.Popen(
-        "cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE
-    )
-else:
-    process = subprocess.Popen(
-        "cat /proc/cpuinfo | grep Raspberry",
-        shell=True,
-        stdout=subprocess.PIPE,
-        text=True,
-    )
-output, _ = process.communicate()
-if sys.version_info[0] == 2:
-    output = output.decode(sys.stdout.encoding)
-
-if "Raspberry" in output:
-    implementation = RaspberryPi()
-elif os.path.exists("/sys/bus/platform/drivers/gpio-x3"):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
-
-for func in [x for x in dir(implementation) if not x.startswith("_")]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+class MockBackend:
+    """
+    Pure-Python stand-in for the GPIO/SPI hardware
+
+    BUSY always reads idle and delays return immediately, so driver code runs
+    at host speed. SPI traffic is only counted, which makes it usable for
+    benchmarks and for running the driver off-device.
+    """
+
+    # Pin definition
+    RST_PIN = 17
+    DC_PIN = 25
+    CS_PIN = 8
+    BUSY_PIN = 24
+    PWR_PIN = 18
+
+    def __init__(self):
+        self.pins = {self.BUSY_PIN: 1}
+        self.spi_writes = 0
+        self.spi_bytes = 0
+
+    def digital_write(self, pin, value):
+        self.pins[pin] = value
+
+    def digital_read(self, pin):
+        return self.pins.get(pin, 0)
+
+    def digital_wait(self, pin, value, timeout_ms=None):
+        return True
+
+    def delay_ms(self, delaytime):
+        pass
+
+    def spi_writebyte(self, data):
+        self.spi_writes += 1
+        self.spi_bytes += len(data)
+
+    def spi_writebyte2(self, data):
+        self.spi_writes += 1
+        self.spi_bytes += len(data)
+
+    def module_init(self, cleanup=False):
+        return 0
+
+    def module_exit(self, cleanup=False):
+        pass
+
+
+# The pins are the same on every platform; exposed directly so constructing
+# an EPD does not select a backend
+RST_PIN = 17
+DC_PIN = 25
+CS_PIN = 8
+BUSY_PIN = 24
+PWR_PIN = 18
+
+PLATFORMS = {
+    "raspberrypi": RaspberryPi,
+    "jetson": JetsonNano,
+    "sunrisex3": SunriseX3,
+    "mock": MockBackend,
+}
+
+# Backend methods the drivers call as epdconfig functions
+FUNCTIONS = (
+    "digital_write",
+    "digital_read",
+    "digital_wait",
+    "delay_ms",
+    "spi_writebyte",
+    "spi_writebyte2",
+    "module_init",
+    "module_exit",
+)
+
+implementation = None
+
+
+@functools.lru_cache(maxsize=None)
+def detect_platform():
+    """Name of the platform this is running on, read from /proc and /sys"""
+    for path in ("/proc/device-tree/model", "/proc/cpuinfo"):
+        try:
+            with open(path, errors="ignore") as f:
+                if "Raspberry" in f.read():
+                    return "raspberrypi"
+        except OSError:
+            pass
+    if os.path.exists("/sys/bus/platform/drivers/gpio-x3"):
+        return "sunrisex3"
+    return "jetson"
+
+
+def use(platform=None, trace=None):
+    """
+    Select and create the hardware backend
+
+    Args:
+        platform: One of PLATFORMS; defaults to the EPD_PLATFORM environment
+            variable, or the detected platform if that is not set
+        trace: Path of a trace file recording every backend call (see
+            epdtrace); defaults to the EPD_TRACE environment variable
+
+    Returns:
+        The backend instance, whose FUNCTIONS become module functions
+    """
+    from .epdtrace import TraceRecorder
+
+    global implementation
+    platform = (platform or os.environ.get("EPD_PLATFORM") or detect_platform()).lower()
+    if platform not in PLATFORMS:
+        raise ValueError(
+            f"Unknown EPD platform '{platform}', expected one of: {', '.join(PLATFORMS)}"
+        )
+    logger.debug(f"Using {platform} EPD backend")
+    if isinstance(implementation, TraceRecorder):
+        # Finish the trace of the backend being replaced
+        implementation.close()
+    implementation = PLATFORMS[platform]()
+
+    trace = trace or os.environ.get("EPD_TRACE")
+    if trace:
+        implementation = TraceRecorder(implementation, trace)
+
+    module = sys.modules[__name__]
+    for func in FUNCTIONS:
+        setattr(module, func, getattr(implementation, func))
+    return implementation
+
+
+def __getattr__(name):
+    # First use of a backend function (digital_write, module_init, ...)
+    # selects the backend; use() then binds them as real module attributes
+    if name not in FUNCTIONS or implementation is not None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(use(), name)
+
 
 ### END OF FILE ###
@@ -0,0 +1,275 @@
+# *****************************************************************************
+# * | File        :	  epdtrace.py
+# * | Function    :   GPIO/SPI trace recording and replay for epdconfig
+# *----------------
+# Records every call a driver makes into the epdconfig backend to a compact
+# binary file, and replays such a file against any epdconfig-style backend.
+#
+# Enable recording with the EPD_TRACE environment variable (a file path) or
+# epdconfig.use(platform, trace=path).
+#
+# File format: MAGIC, then records of
+#   <B op> <I microseconds since the previous record> <op payload>
+# with the payloads listed in PAYLOADS; SPI payloads are a <I length> followed
+# by the bytes.
+# -----------------------------------------------------------------------------
+
+import logging
+import struct
+import time
+from collections import Counter
+from typing import Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EPDTRC1\n"
+
+OP_WRITE = 1  # digital_write(pin, value)
+OP_READ = 2  # digital_read(pin) -> value
+OP_WAIT = 3  # digital_wait(pin, value, timeout_ms) -> result
+OP_DELAY = 4  # delay_ms(ms)
+OP_SPI = 5  # spi_writebyte(data)
+OP_SPI_BULK = 6  # spi_writebyte2(data)
+OP_INIT = 7  # module_init() -> result
+OP_EXIT = 8  # module_exit()
+
+OP_NAMES = {
+    OP_WRITE: "write",
+    OP_READ: "read",
+    OP_WAIT: "wait",
+    OP_DELAY: "delay",
+    OP_SPI: "spi",
+    OP_SPI_BULK: "spi_bulk",
+    OP_INIT: "init",
+    OP_EXIT: "exit",
+}
+
+_RECORD = struct.Struct("<BI")
+_LENGTH = struct.Struct("<I")
+PAYLOADS = {
+    OP_WRITE: struct.Struct("<BB"),
+    OP_READ: struct.Struct("<BB"),
+    # pin, value, result, timeout_ms (NO_TIMEOUT for None)
+    OP_WAIT: struct.Struct("<BBBI"),
+    OP_DELAY: struct.Struct("<f"),
+    OP_INIT: struct.Struct("<b"),
+    OP_EXIT: struct.Struct(""),
+}
+NO_TIMEOUT = 0xFFFFFFFF
+
+# Commands that act (power, RAM writes, refresh, status) rather than set a
+# register, so repeating them is not redundant
+ACTION_COMMANDS = {0x02, 0x04, 0x07, 0x10, 0x12, 0x13, 0x71, 0x91, 0x92}
+
+
+class TraceEvent(NamedTuple):
+    op: int
+    # Microseconds since the start of the trace
+    time_us: int
+    # Payload fields; data bytes for SPI records
+    args: tuple
+
+
+class TraceRecorder:
+    """epdconfig backend wrapper that records every call to a trace file"""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.last_ns = time.monotonic_ns()
+        logger.info(f"Recording EPD trace to {path}")
+
+    def __getattr__(self, name):
+        # Pins and anything else not traced come from the wrapped backend
+        return getattr(self.backend, name)
+
+    def _record(self, op, payload=b""):
+        now = time.monotonic_ns()
+        delta_us = min((now - self.last_ns) // 1000, 0xFFFFFFFF)
+        self.last_ns = now
+        self.file.write(_RECORD.pack(op, delta_us) + payload)
+
+    def digital_write(self, pin, value):
+        self._record(OP_WRITE, PAYLOADS[OP_WRITE].pack(pin, 1 if value else 0))
+        self.backend.digital_write(pin, value)
+
+    def digital_read(self, pin):
+        value = self.backend.digital_read(pin)
+        self._record(OP_READ, PAYLOADS[OP_READ].pack(pin, 1 if value else 0))
+        return value
+
+    def digital_wait(self, pin, value, timeout_ms=None):
+        result = self.backend.digital_wait(pin, value, timeout_ms)
+        timeout = NO_TIMEOUT if timeout_ms is None else int(timeout_ms)
+        self._record(
+            OP_WAIT,
+            PAYLOADS[OP_WAIT].pack(pin, 1 if value else 0, 1 if result else 0, timeout),
+        )
+        return result
+
+    def delay_ms(self, delaytime):
+        self._record(OP_DELAY, PAYLOADS[OP_DELAY].pack(delaytime))
+        self.backend.delay_ms(delaytime)
+
+    def _record_spi(self, op, data):
+        data = bytes(data)
+        self._record(op, _LENGTH.pack(len(data)) + data)
+
+    def spi_writebyte(self, data):
+        self._record_spi(OP_SPI, data)
+        self.backend.spi_writebyte(data)
+
+    def spi_writebyte2(self, data):
+        self._record_spi(OP_SPI_BULK, data)
+        self.backend.spi_writebyte2(data)
+
+    def module_init(self, *args, **kwargs):
+        result = self.backend.module_init(*args, **kwargs)
+        self._record(OP_INIT, PAYLOADS[OP_INIT].pack(result))
+        return result
+
+    def module_exit(self, *args, **kwargs):
+        self._record(OP_EXIT)
+        self.backend.module_exit(*args, **kwargs)
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_trace(path) -> Iterator[TraceEvent]:
+    """Iterate over the events of a trace file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an EPD trace file")
+        time_us = 0
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            op, delta_us = _RECORD.unpack(header)
+            time_us += delta_us
+            if op in (OP_SPI, OP_SPI_BULK):
+                (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+                args = (f.read(length),)
+            elif op in PAYLOADS:
+                payload = PAYLOADS[op]
+                args = payload.unpack(f.read(payload.size))
+            else:
+                raise ValueError(f"Unknown trace record {op} at {time_us} us")
+            yield TraceEvent(op, time_us, args)
+
+
+def replay(events, backend):
+    """
+    Re-drive a trace against an epdconfig-style backend
+
+    BUSY reads and waits block until the pin reaches the recorded value, so
+    commands are never sent to a panel that is still busy, whatever the
+    timing of the replay target.
+    """
+    for event in events:
+        op, args = event.op, event.args
+        if op == OP_WRITE:
+            backend.digital_write(*args)
+        elif op == OP_READ:
+            pin, value = args
+            if backend.digital_read(pin) != value and hasattr(backend, "digital_wait"):
+                backend.digital_wait(pin, value, None)
+        elif op == OP_WAIT:
+            pin, value, _, timeout_ms = args
+            backend.digital_wait(
+                pin, value, None if timeout_ms == NO_TIMEOUT else timeout_ms
+            )
+        elif op == OP_DELAY:
+            backend.delay_ms(args[0])
+        elif op == OP_SPI:
+            backend.spi_writebyte(list(args[0]))
+        elif op == OP_SPI_BULK:
+            backend.spi_writebyte2(args[0])
+        elif op == OP_INIT:
+            backend.module_init()
+        elif op == OP_EXIT:
+            backend.module_exit()
+
+
+def summarize(events, dc_pin=25, rst_pin=17):
+    """
+    Per-trace statistics for spotting wasted time and bytes
+
+    Command bytes are the SPI bytes sent with DC low; every data byte is
+    charged to the command before it. Redundant pin writes set a pin to the
+    value it already had, and redundant register bytes are command+data
+    sequences identical to the last write of the same register since the
+    last hardware reset.
+    """
+    pins = {}
+    command = None
+    command_bytes = Counter()
+    command_data = {}
+    last_register = {}
+    ops = Counter()
+    stats = {
+        "duration_ms": 0.0,
+        "spi_transfers": 0,
+        "spi_bytes": 0,
+        "delay_ms": 0.0,
+        "wait_ms": 0.0,
+        "pin_writes": 0,
+        "redundant_pin_writes": 0,
+        "redundant_register_bytes": 0,
+    }
+
+    def finish_command():
+        if command is None:
+            return
+        data = bytes(command_data.get(command, b""))
+        if command not in ACTION_COMMANDS:
+            if last_register.get(command) == data:
+                stats["redundant_register_bytes"] += 1 + len(data)
+            last_register[command] = data
+
+    previous = None
+    for event in events:
+        ops[OP_NAMES.get(event.op, event.op)] += 1
+        if previous is not None and previous.op in (OP_WAIT, OP_READ):
+            stats["wait_ms"] += (event.time_us - previous.time_us) / 1000.0
+        previous = event
+        stats["duration_ms"] = event.time_us / 1000.0
+
+        if event.op == OP_WRITE:
+            pin, value = event.args
+            stats["pin_writes"] += 1
+            if pins.get(pin) == value:
+                stats["redundant_pin_writes"] += 1
+            pins[pin] = value
+            if pin == rst_pin and value == 0:
+                # A reset restores every register to its default
+                finish_command()
+                command = None
+                last_register.clear()
+        elif event.op == OP_DELAY:
+            stats["delay_ms"] += event.args[0]
+        elif event.op in (OP_SPI, OP_SPI_BULK):
+            data = event.args[0]
+            stats["spi_transfers"] += 1
+            stats["spi_bytes"] += len(data)
+            if pins.get(dc_pin, 1) == 0:
+                for byte in data:
+                    finish_command()
+                    command = byte
+                    command_bytes[command] += 1
+                    command_data[command] = bytearray()
+            elif command is not None:
+                command_bytes[command] += len(data)
+                command_data[command] += data
+    finish_command()
+
+    stats["ops"] = dict(ops)
+    stats["bytes_by_command"] = {
+        f"0x{cmd:02X}": count for cmd, count in sorted(command_bytes.items())
+    }
+    return stats
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Retained widget tree rendering into a packed 1bpp FrameBuffer
+
+Widgets are placed in display coordinates and remember whether they need
+redrawing. Screen redraws only what was invalidated and reports the
+byte-aligned windows that changed since the panel was last updated:
+
+    screen = Screen(800, 480)
+    clock = screen.add(Text(Rect(0, 0, 200, 60), renderer, "12:00"))
+    ...
+    clock.set_text("12:01")
+    screen.flush(epd)  # one display_Partial for the changed digits
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from framebuffer import FrameBuffer, PackedBitmap
+from geometry import Rect, clip_rect, coalesce_windows
+from text_renderer import TextRenderer
+from timing_model import TimingModel
+
+ALIGN_LEFT = "left"
+ALIGN_CENTER = "center"
+ALIGN_RIGHT = "right"
+
+
+class Widget(ABC):
+    """
+    A leaf of the widget tree, drawn within its rectangle
+
+    Subclasses implement draw() and call invalidate() when anything that
+    affects their pixels changes. The area a widget is drawn on is cleared
+    to white first; ink must stay inside the rectangle, since only damaged
+    areas are copied to the screen.
+    """
+
+    def __init__(self, rect: Rect):
+        self.rect = rect
+        self.dirty = True
+        # Rectangle as last drawn, which also needs repainting when the
+        # widget moves, shrinks or is removed
+        self.drawn: Optional[Rect] = None
+
+    def invalidate(self):
+        self.dirty = True
+
+    def move(self, rect: Rect):
+        if rect != self.rect:
+            self.rect = rect
+            self.invalidate()
+
+    def leaves(self) -> Iterator["Widget"]:
+        yield self
+
+    @abstractmethod
+    def draw(self, fb: FrameBuffer):
+        """Draw the widget's ink into the framebuffer"""
+
+
+class Group(Widget):
+    """Widgets drawn and removed together; later children draw on top"""
+
+    def __init__(self, children: Sequence[Widget] = ()):
+        self.children = list(children)
+        super().__init__(self._bounds())
+        self.dirty = False
+
+    def _bounds(self) -> Rect:
+        rects = [child.rect for child in self.children]
+        if not rects:
+            return Rect(0, 0, 0, 0)
+        return Rect(
+            min(r.x0 for r in rects),
+            min(r.y0 for r in rects),
+            max(r.x1 for r in rects),
+            max(r.y1 for r in rects),
+        )
+
+    def add(self, widget: Widget) -> Widget:
+        self.children.append(widget)
+        self.rect = self._bounds()
+        return widget
+
+    def move(self, rect: Rect):
+        """Move every child by the offset of the group's top-left corner"""
+        dx = rect.x0 - self.rect.x0
+        dy = rect.y0 - self.rect.y0
+        for child in self.children:
+            r = child.rect
+            child.move(Rect(r.x0 + dx, r.y0 + dy, r.x1 + dx, r.y1 + dy))
+        self.rect = rect
+
+    def invalidate(self):
+        for child in self.children:
+            child.invalidate()
+
+    def leaves(self) -> Iterator[Widget]:
+        for child in self.children:
+            yield from child.leaves()
+
+    def draw(self, fb: FrameBuffer):
+        for child in self.children:
+            child.draw(fb)
+
+
+class Text(Widget):
+    """
+    A line of text, aligned within its rectangle
+
+    The font's line box is centred vertically, so texts in one renderer
+    share a baseline whatever their ink. Text wider than the rectangle is
+    clipped to it.
+    """
+
+    def __init__(
+        self,
+        rect: Rect,
+        renderer: TextRenderer,
+        text: str = "",
+        align: str = ALIGN_LEFT,
+    ):
+        super().__init__(rect)
+        self.renderer = renderer
+        self.text = text
+        self.align = align
+
+    def set_text(self, text: str):
+        if text != self.text:
+            self.text = text
+            self.invalidate()
+
+    def draw(self, fb: FrameBuffer):
+        if not self.text:
+            return
+        x0, _, x1, _ = self.renderer.bbox(self.text)
+        if self.align == ALIGN_CENTER:
+            x = self.rect.x0 + (self.rect.width - (x1 - x0)) // 2 - x0
+        elif self.align == ALIGN_RIGHT:
+            x = self.rect.x1 - x1
+        else:
+            x = self.rect.x0 - x0
+        y = self.rect.y0 + (self.rect.height - self.renderer.line_height) // 2
+        self.renderer.draw(fb, self.text, x, y, clip=self.rect)
+
+
+class Bitmap(Widget):
+    """A PIL image or PackedBitmap with its top-left corner at (x, y)"""
+
+    def __init__(self, x: int, y: int, image: Union[PackedBitmap, Image.Image]):
+        super().__init__(Rect(x, y, x + image.width, y + image.height))
+        self.image = image
+
+    def set_image(self, image: Union[PackedBitmap, Image.Image]):
+        """Replace the image; the widget is always redrawn"""
+        self.image = image
+        x, y = self.rect.x0, self.rect.y0
+        self.rect = Rect(x, y, x + image.width, y + image.height)
+        self.invalidate()
+
+    def move(self, rect: Rect):
+        """Move to rect's top-left corner; the size stays the image's"""
+        super().move(
+            Rect(
+                rect.x0,
+                rect.y0,
+                rect.x0 + self.image.width,
+                rect.y0 + self.image.height,
+            )
+        )
+
+    def draw(self, fb: FrameBuffer):
+        fb.paste(self.image, self.rect.x0, self.rect.y0)
+
+
+class Rectangle(Widget):
+    """A black rectangle, filled or outlined with the given border width"""
+
+    def __init__(self, rect: Rect, filled: bool = True, border: int = 1):
+        super().__init__(rect)
+        self.filled = filled
+        self.border = border
+
+    def draw(self, fb: FrameBuffer):
+        r = self.rect
+        if self.filled:
+            fb.fill_rect(r, white=False)
+            return
+        b = self.border
+        for edge in (
+            Rect(r.x0, r.y0, r.x1, r.y0 + b),
+            Rect(r.x0, r.y1 - b, r.x1, r.y1),
+            Rect(r.x0, r.y0, r.x0 + b, r.y1),
+            Rect(r.x1 - b, r.y0, r.x1, r.y1),
+        ):
+            fb.fill_rect(edge, white=False)
+
+
+class Icon(Widget):
+    """
+    One of a set of named images, e.g. transport modes or weather states
+
+    The icons are converted to PackedBitmaps once; switching icons only
+    redraws when the name changes.
+    """
+
+    def __init__(
+        self,
+        x: int,
+        y: int,
+        icons: Dict[str, Union[PackedBitmap, Image.Image]],
+        name: str,
+    ):
+        self.icons = {
+            key: (
+                icon
+                if isinstance(icon, PackedBitmap)
+                else PackedBitmap(
+                    icon.convert("1").tobytes("raw"), icon.width, icon.height
+                )
+            )
+            for key, icon in icons.items()
+        }
+        self.name = name
+        icon = self.icons[name]
+        super().__init__(Rect(x, y, x + icon.width, y + icon.height))
+
+    def set_icon(self, name: str):
+        if name != self.name:
+            icon = self.icons[name]
+            self.name = name
+            x, y = self.rect.x0, self.rect.y0
+            self.rect = Rect(x, y, x + icon.width, y + icon.height)
+            self.invalidate()
+
+    def move(self, rect: Rect):
+        """Move to rect's top-left corner; the size stays the icon's"""
+        icon = self.icons[self.name]
+        super().move(
+            Rect(rect.x0, rect.y0, rect.x0 + icon.width, rect.y0 + icon.height)
+        )
+
+    def draw(self, fb: FrameBuffer):
+        fb.paste_packed(self.icons[self.name], self.rect.x0, self.rect.y0)
+
+
+class TableRow(Group):
+    """
+    A row of text cells in fixed-width columns
+
+    columns gives each cell's width, or (width, align). Setting new values
+    only redraws the cells whose text changed.
+    """
+
+    def __init__(
+        self,
+        rect: Rect,
+        renderer: TextRenderer,
+        columns: Sequence[Union[int, Tuple[int, str]]],
+        values: Sequence[str] = (),
+    ):
+        cells = []
+        x = rect.x0
+        for column in columns:
+            width, align = column if isinstance(column, tuple) else (column, ALIGN_LEFT)
+            cells.append(
+                Text(Rect(x, rect.y0, x + width, rect.y1), renderer, align=align)
+            )
+            x += width
+        super().__init__(cells)
+        self.rect = rect
+        self.set_values(values)
+
+    @property
+    def values(self) -> List[str]:
+        return [cell.text for cell in self.children]
+
+    def set_values(self, values: Sequence[str]):
+        for i, cell in enumerate(self.children):
+            cell.set_text(str(values[i]) if i < len(values) else "")
+
+
+class Screen:
+    """
+    Root of the widget tree with the framebuffer it renders into
+
+    render() redraws invalidated widgets and returns the byte-aligned
+    windows that differ from what the panel shows; commit() records windows
+    as sent. Widgets overlapping a repainted area are redrawn in order, so
+    stacking is preserved.
+    """
+
+    def __init__(self, width: int, height: int, timing: Optional[TimingModel] = None):
+        self.width = width
+        self.height = height
+        # Prices windows for flush(); loaded once, not on every flush
+        self.timing = timing or TimingModel.from_env()
+        self.frame = FrameBuffer(width, height)
+        # What the panel currently shows (white after EPD.Clear)
+        self.shown = FrameBuffer(width, height)
+        # Widgets are drawn here first, then only the damaged areas are
+        # copied into frame
+        self.scratch = FrameBuffer(width, height)
+        self.root = Group()
+        self.removed: List[Rect] = []
+
+    def add(self, widget: Widget) -> Widget:
+        return self.root.add(widget)
+
+    def remove(self, widget: Widget):
+        self.root.children.remove(widget)
+        self.root.rect = self.root._bounds()
+        self.removed.extend(
+            leaf.drawn for leaf in widget.leaves() if leaf.drawn is not None
+        )
+
+    def _damage(self) -> List[Rect]:
+        damage = self.removed
+        self.removed = []
+        for leaf in self.root.leaves():
+            if leaf.dirty:
+                if leaf.drawn is not None:
+                    damage.append(leaf.drawn)
+                damage.append(leaf.rect)
+        damage = [clip_rect(rect, self.width, self.height) for rect in damage]
+        return [rect for rect in damage if not rect.is_empty()]
+
+    def render(self) -> List[Rect]:
+        """
+        Redraw invalidated widgets
+
+        Returns:
+            Byte-aligned windows covering every pixel that differs from the
+            panel, ready for EPD.display_Partial
+        """
+        damage = self._damage()
+        if damage:
+            self.scratch.assign(self.frame)
+            for rect in damage:
+                self.scratch.fill_rect(rect)
+            for leaf in self.root.leaves():
+                if leaf.dirty or any(leaf.rect.intersects(rect) for rect in damage):
+                    leaf.draw(self.scratch)
+                    leaf.dirty = False
+                    leaf.drawn = leaf.rect
+            for rect in damage:
+                self.frame.copy_rect(self.scratch, rect)
+        return self.frame.dirty_rects(self.shown)
+
+    def commit(self, windows: Optional[Sequence[Rect]] = None):
+        """Record windows (the whole screen by default) as shown on the panel"""
+        if windows is None:
+            self.shown.assign(self.frame)
+            return
+        for window in windows:
+            self.shown.copy_rect(self.frame, window)
+
+    def flush(self, epd) -> List[Rect]:
+        """
+        Render and send the changes to the panel with partial refreshes
+
+        The dirty windows are merged where one refresh of a larger window is
+        predicted to be cheaper than several small ones (coalesce_windows).
+
+        Returns:
+            The windows refreshed
+        """
+        windows = coalesce_windows(
+            self.render(),
+            self.timing.refresh_ms("partial"),
+            self.timing.transfer_ms(1),
+        )
+        for window in windows:
+            epd.display_Partial(
+                self.frame.window(window), window.x0, window.y0, window.x1, window.y1
+            )
+        self.commit(windows)
+        return windows
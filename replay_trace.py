@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Inspect or replay an EPD GPIO/SPI trace
+
+Record a trace by running any display script with EPD_TRACE set, e.g.
+
+    EPD_TRACE=counter.trace python3 counter.py
+
+then summarize it, replay it through the simulator, or re-drive the panel:
+
+    python3 replay_trace.py counter.trace
+    python3 replay_trace.py counter.trace --target simulation --output panel.png
+    python3 replay_trace.py counter.trace --target hardware
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from waveshare_epd import epdconfig, epdtrace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay an EPD trace")
+    parser.add_argument("trace", help="Trace file recorded with EPD_TRACE")
+    parser.add_argument(
+        "--target",
+        choices=["summary", "simulation", "hardware"],
+        default="summary",
+        help="Print statistics, or replay through the simulator or the panel",
+    )
+    parser.add_argument(
+        "--platform", help="epdconfig platform for --target hardware (e.g. mock)"
+    )
+    parser.add_argument(
+        "--output", help="Save the simulated panel contents to this image file"
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.target == "summary":
+            stats = epdtrace.summarize(epdtrace.read_trace(args.trace))
+        elif args.target == "simulation":
+            from simulation_display import SimulatedBackend
+
+            backend = SimulatedBackend()
+            epdtrace.replay(epdtrace.read_trace(args.trace), backend)
+            stats = backend.display.stats()
+            if args.output:
+                backend.display.to_image().save(args.output)
+                print(f"Saved simulated panel to {args.output}")
+        else:
+            backend = epdconfig.use(args.platform)
+            epdtrace.replay(epdtrace.read_trace(args.trace), backend)
+            stats = {"replayed": args.trace}
+
+        print(json.dumps(stats, indent=2))
+
+    except Exception as e:
+        print(f"Error replaying trace: {e}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,53 @@ import base64
 import logging
 import tempfile
 import asyncio
-from typing import List
-from fastapi import FastAPI, HTTPException
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from PIL import Image
 import uvicorn
 
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from epd_updater import (
+    EPD_WIDTH,
+    EPD_HEIGHT,
+    prepare_image_for_epd,
+    prepare_region_for_epd,
+)
+import metrics
+from dither import DEFAULT_MODE as DEFAULT_DITHER, MODES as DITHER_MODES, validate_mode
+from display_factory import DisplayFactory
+from framebuffer import FrameBuffer, PackedBitmap
+from ghosting import DEFAULT_BUDGET, GhostingTracker
+from refresh_planner import DEFAULT_MAX_PARTIALS_MARGIN, RefreshPlanner
+from update_queue import UpdateQueue
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="E-Paper Web Display Server")
 
+# Partial refreshes any tile may take before a clean full refresh is
+# scheduled, and how long the queue must be idle before it runs
+GHOSTING_BUDGET = int(os.environ.get("EPD_GHOSTING_BUDGET", DEFAULT_BUDGET))
+CLEAN_IDLE_SECONDS = float(os.environ.get("EPD_CLEAN_IDLE_SECONDS", "5.0"))
+# Partial refreshes the planner allows before forcing a fast full refresh.
+# It must stay above the ghosting budget, so updates that arrive before the
+# queue goes idle do not pre-empt the clean refresh
+MAX_PARTIALS = int(
+    os.environ.get("EPD_MAX_PARTIALS", GHOSTING_BUDGET + DEFAULT_MAX_PARTIALS_MARGIN)
+)
+# Dither mode for updates that do not ask for one (see lib/dither.py)
+DITHER_MODE = validate_mode(os.environ.get("EPD_DITHER", DEFAULT_DITHER))
+
 # Add CORS middleware to allow web app to connect
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +73,7 @@ class RegionUpdate(BaseModel):
     width: int
     height: int
     image_data: str  # Base64 encoded image for this region
+    dither: Optional[Literal[DITHER_MODES]] = None  # EPD_DITHER if unset
 
 
 class RegionUpdateRequest(BaseModel):
@@ -51,6 +86,235 @@ class ScreenshotRequest(BaseModel):
     """Legacy full image update request"""
 
     image_data: str  # Base64 encoded image
+    dither: Optional[Literal[DITHER_MODES]] = None  # EPD_DITHER if unset
+
+
+class DisplayDriver:
+    """Long-lived in-process e-paper driver that tracks the panel's refresh mode"""
+
+    MODE_OFF = "off"
+    MODE_FULL = "full"
+    MODE_FAST = "fast"
+    MODE_PARTIAL = "partial"
+    MODE_SLEEP = "sleep"
+
+    def __init__(self, epd=None):
+        # Backend chosen by EPD_BACKEND ("hardware" or "simulation")
+        self.epd = epd if epd is not None else DisplayFactory.create()
+        # Set by sleep() until the next mode switch, to tell a sleeping panel
+        # from one that was never initialized
+        self.asleep = False
+        # Authoritative copy of what is currently shown on the panel
+        self.framebuffer = FrameBuffer(EPD_WIDTH, EPD_HEIGHT)
+        # Chooses partial windows or a full refresh from the timing model
+        self.planner = RefreshPlanner(max_partials=MAX_PARTIALS)
+        # Partial refreshes per tile since the last clean refresh
+        self.ghosting = GhostingTracker(EPD_WIDTH, EPD_HEIGHT, budget=GHOSTING_BUDGET)
+
+    @property
+    def mode(self):
+        """The backend's refresh mode, or "off"/"sleep" when it is powered down"""
+        if self.epd.mode is not None:
+            return self.epd.mode
+        return self.MODE_SLEEP if self.asleep else self.MODE_OFF
+
+    def set_mode(self, mode):
+        """Switch the panel to a refresh mode; nothing is sent if it is already there"""
+        if self.mode == mode:
+            return
+
+        logger.info(f"Switching e-paper display from {self.mode} to {mode} mode")
+        self.asleep = False
+        if self.epd.ensure_mode(mode) != 0:
+            raise RuntimeError(f"Failed to initialize EPD for {mode} mode")
+
+    def start(self):
+        """Initialize the display for partial updates and clear it"""
+        self.set_mode(self.MODE_PARTIAL)
+        self._refresh(self.epd.Clear, 2 * EPD_WIDTH // 8 * EPD_HEIGHT)
+        self.framebuffer.fill(0xFF)
+        self.ghosting.reset()
+
+    @property
+    def panel_mode(self):
+        """Refresh mode the panel is powered in, None when off or asleep"""
+        return self.epd.mode
+
+    def _refresh(self, send, byte_count, *args):
+        """Run a refresh call and record its SPI bytes and busy-wait time"""
+        busy_before = self.epd.busy_ms
+        send(*args)
+        metrics.SPI_BYTES.inc(byte_count)
+        metrics.REFRESHES.inc(mode=self.mode)
+        metrics.BUSY_WAIT_SECONDS.observe(
+            (self.epd.busy_ms - busy_before) / 1000.0, mode=self.mode
+        )
+
+    def update_regions(self, regions):
+        """
+        Composite regions over the current panel contents and flush only the
+        pixels that changed, using the refresh plan with the lowest predicted
+        latency (partial windows or a fast full refresh)
+
+        Args:
+            regions: List of (image, x, y) tuples, images already prepared
+
+        Returns:
+            The RefreshPlan that was carried out
+        """
+        target = self.framebuffer.copy()
+        for image, x, y in regions:
+            target.paste(image, x, y)
+
+        with metrics.ALIGN_SECONDS.time():
+            dirty = target.dirty_rects(self.framebuffer)
+            plan = self.planner.plan(
+                dirty,
+                self.panel_mode,
+                self.ghosting.worst(),
+                first_partial=self.mode != self.MODE_PARTIAL or bool(self.epd.partFlag),
+            )
+        if plan.mode is None:
+            logger.info("No pixels changed, skipping refresh")
+            return plan
+
+        logger.info(
+            f"Refresh plan: {plan.reason}, predicted {plan.predicted_ms:.0f} ms"
+        )
+        metrics.PREDICTED_SECONDS.observe(plan.predicted_ms / 1000.0, mode=plan.mode)
+        if plan.mode != self.MODE_PARTIAL:
+            self._refresh_full(plan.mode, target.to_image())
+            return plan
+
+        self.set_mode(self.MODE_PARTIAL)
+        for window in plan.windows:
+            logger.info(
+                f"Partial refresh window: ({window.x0},{window.y0}) to ({window.x1},{window.y1})"
+            )
+            data = target.window(window)
+            # The first partial refresh also fills the old-data plane
+            byte_count = len(data) * (2 if self.epd.partFlag else 1)
+            self._refresh(
+                self.epd.display_Partial,
+                byte_count,
+                data,
+                window.x0,
+                window.y0,
+                window.x1,
+                window.y1,
+            )
+            self.framebuffer.paste_packed(
+                PackedBitmap(data, window.width, window.height),
+                window.x0,
+                window.y0,
+            )
+        self.ghosting.record(plan.windows)
+        return plan
+
+    def update_full(self, image):
+        """
+        Update the whole display using a fast full refresh (image already prepared)
+
+        Returns:
+            The RefreshPlan that was carried out
+        """
+        plan = self.planner.full_plan(self.MODE_FAST, self.panel_mode, "full frame")
+        metrics.PREDICTED_SECONDS.observe(plan.predicted_ms / 1000.0, mode=plan.mode)
+        self._refresh_full(plan.mode, image)
+        return plan
+
+    def _refresh_full(self, mode, image):
+        """Refresh the whole screen in "fast" or "full" mode"""
+        self.set_mode(mode)
+        # Both planes: the image and a blank red plane
+        self._refresh(self.epd.display_image, 2 * (EPD_WIDTH // 8) * EPD_HEIGHT, image)
+        self.framebuffer.paste(image, 0, 0)
+        self.ghosting.reset()
+
+    def needs_clean_refresh(self):
+        """True once some tile has taken its budget of partial refreshes"""
+        return self.panel_mode is not None and self.ghosting.over_budget()
+
+    def clean_refresh(self):
+        """
+        Redraw the current contents with a normal full refresh to clear
+        ghosting
+
+        Returns:
+            The RefreshPlan that was carried out
+        """
+        plan = self.planner.full_plan(self.MODE_FULL, self.panel_mode, "clean refresh")
+        logger.info(
+            f"Clean refresh after {self.ghosting.worst()} partial refreshes, "
+            f"predicted {plan.predicted_ms:.0f} ms"
+        )
+        metrics.PREDICTED_SECONDS.observe(plan.predicted_ms / 1000.0, mode=plan.mode)
+        self._refresh_full(plan.mode, self.framebuffer.to_image())
+        return plan
+
+    def sleep(self):
+        """Put the display into deep sleep"""
+        if self.panel_mode is None:
+            return
+        self.epd.sleep()
+        self.asleep = True
+
+
+# In-process driver and the queue that owns it; None when the hardware could
+# not be opened and the subprocess path is used instead
+display_driver = None
+update_queue = None
+
+# Serializes epd_updater.py subprocesses so they do not race on the SPI bus
+subprocess_lock = asyncio.Lock()
+
+# Bounded pool for the CPU-bound image stage (decode, resize, 1bpp convert).
+# PIL releases the GIL for that work, so the regions of a request are prepared
+# in parallel while only the SPI/refresh stage is serialized by the queue.
+IMAGE_WORKERS = int(os.environ.get("EPD_IMAGE_WORKERS", min(4, os.cpu_count() or 1)))
+image_executor = None
+
+
+def decode_image_data(image_data: str) -> bytes:
+    """Decode a base64 image, with or without a data URL prefix"""
+    return base64.b64decode(
+        image_data.split(",")[1] if "," in image_data else image_data
+    )
+
+
+def decode_image(image_data: str) -> Image.Image:
+    """Decode a base64 image into a PIL image"""
+    with metrics.DECODE_SECONDS.time():
+        image = Image.open(io.BytesIO(decode_image_data(image_data)))
+        image.load()
+    return image
+
+
+def prepare_region(region: RegionUpdate):
+    """Decode and convert a region update into an (image, x, y) tuple"""
+    image = decode_image(region.image_data)
+    with metrics.CONVERT_SECONDS.time():
+        image = prepare_region_for_epd(
+            image,
+            region.width,
+            region.height,
+            region.dither or DITHER_MODE,
+            origin=(region.x, region.y),
+        )
+    return image, region.x, region.y
+
+
+def prepare_frame(image_data: str, dither_mode: Optional[str] = None) -> Image.Image:
+    """Decode and convert a full frame"""
+    image = decode_image(image_data)
+    with metrics.CONVERT_SECONDS.time():
+        return prepare_image_for_epd(image, dither_mode or DITHER_MODE)
+
+
+async def run_in_image_pool(func, *args):
+    """Run image preparation in the worker pool, keeping the event loop free"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(image_executor, func, *args)
 
 
 async def process_region_update(region: RegionUpdate) -> bool:
@@ -59,11 +323,7 @@ async def process_region_update(region: RegionUpdate) -> bool:
         # Create a temporary file for the region image
         with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
             # Decode base64 image data
-            image_data = base64.b64decode(
-                region.image_data.split(",")[1]
-                if "," in region.image_data
-                else region.image_data
-            )
+            image_data = decode_image_data(region.image_data)
 
             # Write the region image to temporary file
             temp_file.write(image_data)
@@ -79,20 +339,23 @@ async def process_region_update(region: RegionUpdate) -> bool:
             str(region.y),
             str(region.width),
             str(region.height),
+            "--dither",
+            region.dither or DITHER_MODE,
         ]
 
         logger.info(f"Running region update command: {' '.join(cmd)}")
 
         # Run the subprocess
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=os.getcwd(),
-        )
+        with metrics.SUBPROCESS_SECONDS.time():
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=os.getcwd(),
+            )
 
-        # Wait for the process to complete
-        stdout, stderr = await process.communicate()
+            # Wait for the process to complete
+            stdout, stderr = await process.communicate()
 
         # Clean up temporary file
         try:
@@ -121,6 +384,26 @@ async def process_region_update(region: RegionUpdate) -> bool:
 @app.on_event("startup")
 async def startup_event():
     """Initialize the e-paper display on startup"""
+    global display_driver, update_queue, image_executor
+
+    image_executor = ThreadPoolExecutor(
+        max_workers=IMAGE_WORKERS, thread_name_prefix="epd-image"
+    )
+
+    try:
+        logger.info("Initializing in-process e-paper display driver...")
+        driver = DisplayDriver()
+        await asyncio.to_thread(driver.start)
+        display_driver = driver
+        update_queue = UpdateQueue(driver, clean_idle_seconds=CLEAN_IDLE_SECONDS)
+        update_queue.start()
+        logger.info("E-paper display initialized successfully")
+        return
+    except Exception as e:
+        logger.warning(
+            f"In-process driver unavailable, falling back to subprocess updates: {e}"
+        )
+
     try:
         # Initialize the EPD display
         logger.info("Initializing e-paper display...")
@@ -153,6 +436,19 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up the e-paper display on shutdown"""
+    if image_executor is not None:
+        image_executor.shutdown(wait=False)
+
+    if display_driver is not None:
+        try:
+            await update_queue.stop()
+            logger.info("Putting e-paper display to sleep...")
+            await asyncio.to_thread(display_driver.sleep)
+            logger.info("E-paper display put to sleep successfully")
+        except Exception as e:
+            logger.error(f"Error putting display to sleep: {e}")
+        return
+
     try:
         logger.info("Putting e-paper display to sleep...")
         result = await asyncio.create_subprocess_exec(
@@ -183,22 +479,56 @@ async def root():
 
 @app.post("/update-regions")
 async def update_regions(request: RegionUpdateRequest):
-    """Update the e-paper display with specific regions using subprocess"""
+    """Update the e-paper display with specific regions"""
+    if display_driver is None:
+        return await update_regions_subprocess(request)
+
     try:
         logger.info(f"Processing {len(request.regions)} region updates")
 
-        # Process each region iteratively using subprocess
-        successful_updates = 0
-        for i, region in enumerate(request.regions):
-            logger.info(
-                f"Processing region {i+1}/{len(request.regions)}: ({region.x}, {region.y}) {region.width}x{region.height}"
+        with metrics.UPDATE_SECONDS.time(endpoint="update-regions"):
+            regions = await asyncio.gather(
+                *(
+                    run_in_image_pool(prepare_region, region)
+                    for region in request.regions
+                )
             )
+            result = await update_queue.submit_regions(regions)
+
+        logger.info(
+            f"Region updates completed: {len(regions)} regions in {result['refreshes']} refreshes"
+        )
+        return {
+            "status": "success",
+            "message": f"Updated {len(regions)}/{len(regions)} regions",
+            **result,
+        }
+
+    except Exception as e:
+        logger.error(f"Error updating regions: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to update regions: {str(e)}"
+        )
 
-            success = await process_region_update(region)
-            if success:
-                successful_updates += 1
-            else:
-                logger.warning(f"Failed to update region {i+1}")
+
+async def update_regions_subprocess(request: RegionUpdateRequest):
+    """Update regions one at a time using the epd_updater.py subprocess"""
+    try:
+        logger.info(f"Processing {len(request.regions)} region updates")
+
+        # Process each region iteratively using subprocess
+        successful_updates = 0
+        async with subprocess_lock:
+            for i, region in enumerate(request.regions):
+                logger.info(
+                    f"Processing region {i+1}/{len(request.regions)}: ({region.x}, {region.y}) {region.width}x{region.height}"
+                )
+
+                success = await process_region_update(region)
+                if success:
+                    successful_updates += 1
+                else:
+                    logger.warning(f"Failed to update region {i+1}")
 
         logger.info(
             f"Region updates completed: {successful_updates}/{len(request.regions)} successful"
@@ -215,38 +545,93 @@ async def update_regions(request: RegionUpdateRequest):
         )
 
 
+@app.post("/update-frame")
+async def update_frame(request: ScreenshotRequest):
+    """
+    Full frame update that only refreshes the pixels that changed
+
+    The frame is diffed against the server's framebuffer and the changed
+    areas are sent as partial refreshes, so clients do not need to track
+    dirty regions themselves.
+    """
+    if update_queue is None:
+        raise HTTPException(
+            status_code=503, detail="Frame diffing requires the in-process driver"
+        )
+
+    try:
+        with metrics.UPDATE_SECONDS.time(endpoint="update-frame"):
+            image = await run_in_image_pool(
+                prepare_frame, request.image_data, request.dither
+            )
+            result = await update_queue.submit_regions([(image, 0, 0)])
+
+        logger.info(f"Frame update completed in {result['refreshes']} refreshes")
+        return {"status": "success", "message": "Frame updated", **result}
+
+    except Exception as e:
+        logger.error(f"Error updating frame: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to update frame: {str(e)}")
+
+
 @app.post("/update-display")
 async def update_display(request: ScreenshotRequest):
-    """Legacy endpoint for full image updates using subprocess"""
+    """Legacy endpoint for full image updates"""
+    if display_driver is None:
+        return await update_display_subprocess(request)
+
+    try:
+        with metrics.UPDATE_SECONDS.time(endpoint="update-display"):
+            image = await run_in_image_pool(
+                prepare_frame, request.image_data, request.dither
+            )
+            result = await update_queue.submit_full(image)
+
+        logger.info("Full image update completed successfully")
+        return {"status": "success", "message": "Display updated", **result}
+
+    except Exception as e:
+        logger.error(f"Error updating display: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to update display: {str(e)}"
+        )
+
+
+async def update_display_subprocess(request: ScreenshotRequest):
+    """Full image update using the epd_updater.py subprocess"""
     try:
         # Create a temporary file for the full image
         with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
             # Decode base64 image data
-            image_data = base64.b64decode(
-                request.image_data.split(",")[1]
-                if "," in request.image_data
-                else request.image_data
-            )
+            image_data = decode_image_data(request.image_data)
 
             # Write the image to temporary file
             temp_file.write(image_data)
             temp_file_path = temp_file.name
 
         # Build the command for full image update
-        cmd = ["python3", "epd_updater.py", temp_file_path]
+        cmd = [
+            "python3",
+            "epd_updater.py",
+            temp_file_path,
+            "--dither",
+            request.dither or DITHER_MODE,
+        ]
 
         logger.info(f"Running full image update command: {' '.join(cmd)}")
 
         # Run the subprocess
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=os.getcwd(),
-        )
-
-        # Wait for the process to complete
-        stdout, stderr = await process.communicate()
+        async with subprocess_lock:
+            with metrics.SUBPROCESS_SECONDS.time():
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=os.getcwd(),
+                )
+
+                # Wait for the process to complete
+                stdout, stderr = await process.communicate()
 
         # Clean up temporary file
         try:
@@ -275,13 +660,196 @@ async def update_display(request: ScreenshotRequest):
         )
 
 
+def region_param(request: Request, value: Optional[int], name: str) -> int:
+    """Read a region coordinate from the query string or an X-Region-* header"""
+    if value is not None:
+        return value
+    header = request.headers.get(f"x-region-{name}")
+    if header is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing region parameter '{name}' (query or X-Region-{name.capitalize()} header)",
+        )
+    try:
+        return int(header)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid X-Region-{name.capitalize()} header"
+        )
+
+
+@app.post("/update-framebuffer")
+async def update_framebuffer(
+    request: Request,
+    x: Optional[int] = None,
+    y: Optional[int] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+):
+    """
+    Update a region from raw packed 1bpp data (application/octet-stream)
+
+    The body uses the panel's native layout: rows of ceil(width / 8) bytes,
+    most significant bit first, 1 = white and 0 = black. The region is given
+    by x, y, width and height query parameters or X-Region-* headers.
+    """
+    if update_queue is None:
+        raise HTTPException(
+            status_code=503, detail="Binary updates require the in-process driver"
+        )
+
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("application/octet-stream"):
+        raise HTTPException(
+            status_code=415, detail="Expected an application/octet-stream body"
+        )
+
+    x = region_param(request, x, "x")
+    y = region_param(request, y, "y")
+    width = region_param(request, width, "width")
+    height = region_param(request, height, "height")
+
+    body = await request.body()
+    try:
+        bitmap = PackedBitmap(body, width, height)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        with metrics.UPDATE_SECONDS.time(endpoint="update-framebuffer"):
+            result = await update_queue.submit_regions([(bitmap, x, y)])
+        logger.info(f"Binary region update completed: ({x}, {y}) {width}x{height}")
+        return {"status": "success", "message": "Region updated", **result}
+
+    except Exception as e:
+        logger.error(f"Error updating framebuffer region: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to update region: {str(e)}"
+        )
+
+
+# Binary WebSocket frame header: frame id, x, y, width, height (little endian)
+WS_FRAME_HEADER = struct.Struct("<IHHHH")
+
+
+@app.websocket("/ws")
+async def websocket_updates(websocket: WebSocket):
+    """
+    Stream region updates over a WebSocket
+
+    Each binary message is a WS_FRAME_HEADER followed by packed 1bpp data in
+    the same layout as /update-framebuffer. Every frame gets JSON acks:
+    "queued" with its queue position, "started" when the refresh begins and
+    "done" (or "error") when it has finished.
+    """
+    await websocket.accept()
+    if update_queue is None:
+        await websocket.close(code=1013, reason="In-process driver not available")
+        return
+
+    send_lock = asyncio.Lock()
+    frame_tasks = set()
+
+    async def send_ack(message):
+        async with send_lock:
+            await websocket.send_text(json.dumps(message))
+
+    async def track_frame(frame_id, future):
+        try:
+            result = await future
+            await send_ack({"frame": frame_id, "status": "done", **result})
+        except Exception as e:
+            await send_ack({"frame": frame_id, "status": "error", "detail": str(e)})
+
+    def on_start(frame_id):
+        def started(started_at):
+            task = asyncio.create_task(
+                send_ack(
+                    {"frame": frame_id, "status": "started", "started_at": started_at}
+                )
+            )
+            frame_tasks.add(task)
+            task.add_done_callback(frame_tasks.discard)
+
+        return started
+
+    try:
+        while True:
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            message = received.get("bytes")
+            if message is None:
+                await send_ack(
+                    {"status": "error", "detail": "Frames must be binary messages"}
+                )
+                continue
+            if len(message) < WS_FRAME_HEADER.size:
+                await send_ack({"status": "error", "detail": "Frame header too short"})
+                continue
+
+            frame_id, x, y, width, height = WS_FRAME_HEADER.unpack_from(message)
+            try:
+                bitmap = PackedBitmap(
+                    memoryview(message)[WS_FRAME_HEADER.size :], width, height
+                )
+            except ValueError as e:
+                await send_ack({"frame": frame_id, "status": "error", "detail": str(e)})
+                continue
+
+            future = update_queue.submit_regions(
+                [(bitmap, x, y)], on_start=on_start(frame_id)
+            )
+            await send_ack(
+                {
+                    "frame": frame_id,
+                    "status": "queued",
+                    "position": update_queue.stats()["depth"],
+                }
+            )
+            task = asyncio.create_task(track_frame(frame_id, future))
+            frame_tasks.add(task)
+            task.add_done_callback(frame_tasks.discard)
+
+    except WebSocketDisconnect:
+        logger.info("WebSocket client disconnected")
+    finally:
+        for task in frame_tasks:
+            task.cancel()
+
+
 @app.get("/status")
 async def get_status():
     """Get current display status"""
     return {
         "display_connected": True,
+        "driver": "in-process" if display_driver is not None else "subprocess",
+        "backend": (
+            type(display_driver.epd).__name__ if display_driver is not None else None
+        ),
+        "mode": display_driver.mode if display_driver is not None else None,
+        "ghosting": (
+            display_driver.ghosting.stats() if display_driver is not None else None
+        ),
+        "queue": update_queue.stats() if update_queue is not None else None,
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage update pipeline metrics in the Prometheus text format"""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/queue")
+async def get_queue_stats():
+    """Get update queue depth and coalescing counters"""
+    if update_queue is None:
+        raise HTTPException(status_code=503, detail="Update queue not running")
+    return update_queue.stats()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for selecting the epdconfig backend
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from waveshare_epd import epdconfig, epdtrace
+
+
+def test_use_binds_only_the_backend_functions():
+    """Backend state and recorder internals do not become module attributes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = epdconfig.use("mock", trace=os.path.join(tmp, "a.trace"))
+        for name in ("spi_bytes", "pins", "file", "path", "backend", "close"):
+            assert not hasattr(epdconfig, name)
+        assert epdconfig.spi_writebyte == recorder.spi_writebyte
+
+        # Switching backends finishes the previous trace
+        backend = epdconfig.use("mock")
+        assert recorder.file.closed
+        epdconfig.spi_writebyte2(b"\x00" * 4)
+        assert backend.spi_bytes == 4
+
+        events = list(epdtrace.read_trace(recorder.path))
+        assert events == []
+
+
+if __name__ == "__main__":
+    test_use_binds_only_the_backend_functions()
+    print("OK")
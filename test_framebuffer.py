@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Randomized checks of the packed framebuffer against PIL
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from framebuffer import FrameBuffer, PackedBitmap
+
+WIDTH = 200
+HEIGHT = 64
+
+
+def random_image(rng, width, height):
+    """Mode "1" noise image"""
+    noise = np.array(
+        [[rng.random() < 0.5 for _ in range(width)] for _ in range(height)]
+    )
+    return Image.fromarray(noise).convert("1")
+
+
+def random_frame(rng):
+    fb = FrameBuffer(WIDTH, HEIGHT)
+    fb.paste(random_image(rng, WIDTH, HEIGHT), 0, 0)
+    return fb
+
+
+def test_paste_matches_pil():
+    """paste() and paste_packed() agree with PIL's paste, clipped or not"""
+    rng = random.Random(18)
+    for _ in range(200):
+        fb = random_frame(rng)
+        expected = fb.to_image()
+        image = random_image(rng, rng.randint(1, 40), rng.randint(1, 20))
+        x = rng.randint(-30, WIDTH + 10)
+        y = rng.randint(-15, HEIGHT + 5)
+        packed = fb.copy()
+
+        fb.paste(image, x, y)
+        packed.paste_packed(
+            PackedBitmap(image.tobytes("raw"), image.width, image.height), x, y
+        )
+        expected.paste(image, (x, y))
+
+        assert fb.to_image().tobytes() == expected.tobytes(), (x, y, image.size)
+        assert packed.tobytes() == fb.tobytes(), (x, y, image.size)
+
+
+def test_dirty_rects_cover_every_change():
+    """dirty_rects() is byte-aligned, covers every changed pixel, never overlaps"""
+    rng = random.Random(6)
+    for _ in range(200):
+        before = random_frame(rng)
+        after = before.copy()
+        for _ in range(rng.randint(0, 5)):
+            image = random_image(rng, rng.randint(1, 30), rng.randint(1, 12))
+            after.paste(image, rng.randint(-10, WIDTH), rng.randint(-5, HEIGHT))
+
+        rects = after.dirty_rects(before)
+        changed = np.asarray(after.to_image()) != np.asarray(before.to_image())
+        covered = np.zeros_like(changed)
+        for rect in rects:
+            assert rect.x0 % 8 == 0 and (rect.x1 % 8 == 0 or rect.x1 == WIDTH)
+            assert not covered[rect.y0 : rect.y1, rect.x0 : rect.x1].any()
+            covered[rect.y0 : rect.y1, rect.x0 : rect.x1] = True
+        assert not (changed & ~covered).any()
+        # Every rectangle is tight: its first and last rows change
+        for rect in rects:
+            assert changed[rect.y0, rect.x0 : rect.x1].any()
+            assert changed[rect.y1 - 1, rect.x0 : rect.x1].any()
+
+
+if __name__ == "__main__":
+    test_paste_matches_pil()
+    test_dirty_rects_cover_every_change()
+    print("OK")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Regression test for switching the panel out of partial mode
+
+Records the driver's GPIO/SPI traffic on the mock backend and replays the
+trace through the simulator, which models the controller's partial window
+(0x91 until 0x92 or a reset).
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from refresh_planner import RefreshPlanner
+from simulation_display import SimulatedBackend, SimulationDisplay
+from timing_model import TimingModel
+from waveshare_epd import epd7in5b_V2, epdconfig, epdtrace
+
+
+def test_full_frame_after_partial():
+    """A full frame sent after partial updates must cover the whole panel"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "mode_switch.trace")
+        recorder = epdconfig.use("mock", trace=path)
+        try:
+            epd = epd7in5b_V2.EPD()
+            assert epd.init_part() == 0
+            epd.Clear()
+            epd.display_Partial(bytes(80 // 8 * 8), 0, 0, 80, 8)
+            assert epd.ensure_mode("fast") == 0
+            epd.display_image(Image.new("1", (epd.width, epd.height), 0))
+        finally:
+            recorder.close()
+
+        backend = SimulatedBackend()
+        epdtrace.replay(epdtrace.read_trace(path), backend)
+
+    black = np.count_nonzero(~np.asarray(backend.display.to_image()))
+    assert black == epd7in5b_V2.EPD_WIDTH * epd7in5b_V2.EPD_HEIGHT
+
+
+def test_planner_prices_leaving_partial_mode():
+    """Leaving partial mode costs a reset and power-on, not a few registers"""
+    timing = TimingModel()
+    planner = RefreshPlanner(timing)
+    switch = planner.switch_ms("partial", "fast")
+    assert switch >= timing.reset_ms + timing.power_on_ms
+
+    plan = planner.full_plan("fast", "partial")
+    assert plan.predicted_ms == planner.full_plan("fast", None).predicted_ms
+    same_mode = planner.full_plan("fast", "fast")
+    assert abs(plan.predicted_ms - same_mode.predicted_ms - switch) < 1e-6
+
+
+def test_reset_invalidates_old_data_plane():
+    """Only a reset makes the next partial update rewrite the old-data plane"""
+    display = SimulationDisplay(time_scale=0)
+    assert display.ensure_mode("partial") == 0
+    display.display_Partial(bytes(10), 0, 0, 80, 1)
+    assert display.partFlag == 0
+
+    assert display.ensure_mode("partial") == 0
+    assert display.resets == 1 and display.partFlag == 0
+
+    display.ensure_mode("fast")
+    display.ensure_mode("partial")
+    assert display.resets == 3 and display.partFlag == 1
+
+
+if __name__ == "__main__":
+    test_full_frame_after_partial()
+    test_planner_prices_leaving_partial_mode()
+    test_reset_invalidates_old_data_plane()
+    print("OK")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Randomized check that incremental widget rendering matches a full redraw
+"""
+
+import os
+import random
+import sys
+
+from PIL import Image
+
+# Add the lib directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+
+from framebuffer import FrameBuffer
+from geometry import Rect
+from simulation_display import SimulationDisplay
+from text_renderer import TextRenderer, load_font
+from timing_model import TimingModel
+from widgets import ALIGN_CENTER, ALIGN_RIGHT, Bitmap, Rectangle, Screen, TableRow, Text
+
+WORDS = ["", "T1", "Hornsby", "6 min", "Parramatta via Strathfield", "+3", "Now"]
+
+
+def random_rect(rng, width, height):
+    x0 = rng.randint(-20, width - 10)
+    y0 = rng.randint(-10, height - 10)
+    return Rect(x0, y0, x0 + rng.randint(8, 300), y0 + rng.randint(8, 60))
+
+
+def random_widget(rng, renderer, width, height):
+    kind = rng.randrange(4)
+    rect = random_rect(rng, width, height)
+    if kind == 0:
+        align = rng.choice([None, ALIGN_CENTER, ALIGN_RIGHT])
+        text = rng.choice(WORDS)
+        if align is None:
+            return Text(rect, renderer, text)
+        return Text(rect, renderer, text, align=align)
+    if kind == 1:
+        return Rectangle(rect, filled=rng.random() < 0.5, border=rng.randint(1, 4))
+    if kind == 2:
+        image = Image.new("1", (rng.randint(1, 40), rng.randint(1, 40)), 1)
+        image.paste(0, (0, 0, image.width // 2, image.height // 2))
+        return Bitmap(rect.x0, rect.y0, image)
+    columns = [rng.randint(20, 120), (rng.randint(20, 120), ALIGN_RIGHT)]
+    return TableRow(rect, renderer, columns, [rng.choice(WORDS), rng.choice(WORDS)])
+
+
+def mutate(rng, screen, renderer):
+    widgets = screen.root.children
+    # Adding is twice as likely as any other edit, so the screen fills up
+    action = rng.randrange(5)
+    if action >= 3 or not widgets:
+        screen.add(random_widget(rng, renderer, screen.width, screen.height))
+    elif action == 1:
+        screen.remove(rng.choice(widgets))
+    elif action == 2:
+        widget = rng.choice(widgets)
+        widget.move(random_rect(rng, screen.width, screen.height))
+    else:
+        widget = rng.choice(widgets)
+        if isinstance(widget, Text):
+            widget.set_text(rng.choice(WORDS))
+        elif isinstance(widget, TableRow):
+            widget.set_values([rng.choice(WORDS), rng.choice(WORDS)])
+        else:
+            widget.invalidate()
+
+
+def test_incremental_render_matches_full_redraw():
+    """After every flush the panel equals the widget tree drawn from scratch"""
+    rng = random.Random(24)
+    renderer = TextRenderer(load_font(20))
+    screen = Screen(320, 160, timing=TimingModel())
+    display = SimulationDisplay(time_scale=0)
+    display.width, display.height = screen.width, screen.height
+    display.panel = FrameBuffer(screen.width, screen.height)
+
+    for step in range(150):
+        for _ in range(rng.randint(1, 3)):
+            mutate(rng, screen, renderer)
+        screen.flush(display)
+
+        expected = FrameBuffer(screen.width, screen.height)
+        for leaf in screen.root.leaves():
+            leaf.draw(expected)
+        assert screen.frame.tobytes() == expected.tobytes(), step
+        assert display.panel.tobytes() == expected.tobytes(), step
+
+
+if __name__ == "__main__":
+    test_incremental_render_matches_full_redraw()
+    print("OK")